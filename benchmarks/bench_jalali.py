@@ -0,0 +1,63 @@
+import os
+import sys
+import argparse
+from datetime import date as Date, timedelta
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_manager import JalaliCalendar, gregorian_to_jalali, jalali_to_gregorian, QCalendar
+
+
+# One year of history as the heatmap renders it: year bounds, 12 month labels and one label per day
+def render_on_the_fly(jy):
+    first = jalali_to_gregorian(jy, 1, 1)
+    last = jalali_to_gregorian(jy + 1, 1, 1) - timedelta(days=1)
+    months = [jalali_to_gregorian(jy, month, 1) for month in range(1, 13)]
+    days = [gregorian_to_jalali(day.year, day.month, day.day)
+            for day in (first + timedelta(days=offset) for offset in range((last - first).days + 1))]
+    return months, days
+
+def render_with_tables(calendar, jy):
+    first, last = calendar.year_range(jy)
+    months = [calendar.month_range(jy, month)[0] for month in range(1, 13)]
+    days = [calendar.to_jalali(first + timedelta(days=offset)) for offset in range((last - first).days + 1)]
+    return months, days
+
+def render_with_qcalendar(calendar, jy):
+    first = calendar.dateFromParts(jy, 1, 1)
+    last = calendar.dateFromParts(jy + 1, 1, 1).addDays(-1)
+    months = [calendar.dateFromParts(jy, month, 1) for month in range(1, 13)]
+    days = []
+    for offset in range(first.daysTo(last) + 1):
+        parts = calendar.partsFromDate(first.addDays(offset))
+        days.append((parts.year, parts.month, parts.day))
+    return months, days
+
+def measure(label, render, repeat):
+    start = perf_counter()
+    for _ in range(repeat):
+        render()
+    elapsed = (perf_counter() - start) / repeat * 1000
+    print(f'{label:<24}{elapsed:10.3f} ms/year')
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare Jalali table lookups with on-the-fly conversion.')
+    parser.add_argument('--year', type=int, default=gregorian_to_jalali(*Date.today().timetuple()[:3])[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    this_year = Date.today().year
+    start = perf_counter()
+    calendar = JalaliCalendar(this_year - 10, this_year + 9)
+    print(f'{"build tables":<24}{(perf_counter() - start) * 1000:10.3f} ms ({len(calendar.years)} days)')
+
+    assert render_with_tables(calendar, args.year)[1] == render_on_the_fly(args.year)[1]
+    baseline = measure('on-the-fly arithmetic', lambda: render_on_the_fly(args.year), args.repeat)
+    qt = measure('on-the-fly QCalendar', lambda: render_with_qcalendar(QCalendar(QCalendar.System.Jalali), args.year), args.repeat)
+    tables = measure('precomputed tables', lambda: render_with_tables(calendar, args.year), args.repeat)
+    print(f'speedup: {baseline / tables:.1f}x vs arithmetic, {qt / tables:.1f}x vs QCalendar')
+
+if __name__ == '__main__':
+    main()
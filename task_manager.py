@@ -3,56 +3,354 @@ import os
 import sqlite3
 import uuid
 import random
-from datetime import datetime, timedelta
+import json
+import shutil
+import hashlib
+import mmap
+import tempfile
+import socket
+import getpass
+import argparse
+import csv
+import re
+from array import array
+from time import perf_counter, sleep
+from datetime import datetime, timedelta, date as Date
+from itertools import groupby
+from typing import NamedTuple
+if sys.platform == 'win32':
+    import msvcrt
+    import _winapi
+
+INSTANCE_NAME = f'TaskManager-{getpass.getuser()}'
+TIME_PATTERN = re.compile(r'([01][0-9]|2[0-3]):[0-5][0-9]')
+
+def instance_address():
+    if sys.platform == 'win32':
+        return '\\\\.\\pipe\\' + INSTANCE_NAME
+    return os.path.join(tempfile.gettempdir(), INSTANCE_NAME)
+
+def command_date(value):
+    return Date.fromisoformat(value).isoformat()
+
+def command_time(value):
+    if not TIME_PATTERN.fullmatch(value):
+        raise ValueError(value)
+    return value
+
+def parse_command_line(argv):
+    parser = argparse.ArgumentParser(prog='task_manager.py')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('show')
+    add_parser = commands.add_parser('add')
+    add_parser.add_argument('title')
+    add_parser.add_argument('--date', type=command_date, default=datetime.now().strftime('%Y-%m-%d'))
+    add_parser.add_argument('--time', type=command_time, default='')
+    complete_parser = commands.add_parser('complete')
+    complete_parser.add_argument('id', type=int)
+    sync_parser = commands.add_parser('sync')
+    sync_parser.add_argument('path', type=os.path.abspath)
+    args, _ = parser.parse_known_args(argv)
+    command = vars(args)
+    command['command'] = command['command'] or 'show'
+    return command
+
+def report_reply(reply):
+    if not reply.get('ok'):
+        print(reply.get('error'), file=sys.stderr)
+    elif 'id' in reply:
+        print(reply['id'])
+    return 0 if reply.get('ok') else 1
+
+# Returns None only when no instance is listening; a running instance that does not answer still owns the address.
+def send_instance_command(command, timeout=0.5, reply_timeout=10):
+    payload = (json.dumps(command) + '\n').encode('utf-8')
+    try:
+        if sys.platform == 'win32':
+            connection = open(instance_address(), 'r+b', buffering=0)
+        else:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(timeout)
+            connection.connect(instance_address())
+    except OSError:
+        return None
+    try:
+        with connection:
+            if sys.platform == 'win32':
+                connection.write(payload)
+                handle = msvcrt.get_osfhandle(connection.fileno())
+                deadline = perf_counter() + reply_timeout
+                while not _winapi.PeekNamedPipe(handle, 0)[0]:
+                    if perf_counter() > deadline:
+                        raise TimeoutError('no reply from the running instance')
+                    sleep(0.01)
+                reply = connection.readline()
+            else:
+                connection.settimeout(reply_timeout)
+                connection.sendall(payload)
+                reply = connection.makefile('rb').readline()
+    except OSError as e:
+        return {'ok': False, 'error': str(e)}
+    return json.loads(reply) if reply else {'ok': False, 'error': 'the running instance closed the connection'}
+
+# Hand the command to an already running instance before loading Qt or opening the database.
+if __name__ == '__main__':
+    CLI_COMMAND = parse_command_line(sys.argv[1:])
+    CLI_REPLY = send_instance_command(CLI_COMMAND)
+    if CLI_REPLY is not None:
+        sys.exit(report_reply(CLI_REPLY))
+
 import pendulum
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
     QTabWidget, QCalendarWidget, QListWidget, QListWidgetItem, QPushButton,
     QLineEdit, QTextEdit, QComboBox, QCheckBox, QLabel, QDialog, QMessageBox,
     QSystemTrayIcon, QMenu, QSpinBox, QDateEdit, QTimeEdit, QScrollArea,
-    QProgressBar, QSizePolicy, QToolButton, QInputDialog
+    QProgressBar, QSizePolicy, QToolButton, QInputDialog, QFileDialog, QAbstractItemView, QProgressDialog, QToolTip, QColorDialog
 )
-from PyQt6.QtCore import Qt, QTimer, QTranslator, QLocale, QDate, QTime, QPropertyAnimation, QEasingCurve, QSize, QRect
-from PyQt6.QtGui import QColor, QIcon, QFont, QPalette, QPainter, QLinearGradient
+from PyQt6.QtCore import Qt, QTimer, QTranslator, QLocale, QDate, QTime, QPropertyAnimation, QEasingCurve, QSize, QRect, QUrl, QObject, QCalendar, QLockFile, pyqtSignal
+from PyQt6.QtGui import QColor, QIcon, QFont, QPalette, QPainter, QLinearGradient, QImage, QPixmap, QDesktopServices, QTextCharFormat
 from PyQt6.QtSvgWidgets import QSvgWidget
+from PyQt6.QtNetwork import QLocalServer
 import qdarkstyle
 from plyer import notification
 import win32api
 import win32con
 
+TASKS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY{autoincrement},
+        title TEXT NOT NULL,
+        description TEXT,
+        date TEXT NOT NULL,
+        time TEXT,
+        priority INTEGER,
+        category TEXT,
+        is_recurring BOOLEAN,
+        recurring_type TEXT,
+        status TEXT,
+        created_at TEXT,
+        updated_at TEXT,
+        notes TEXT,
+        attachment_path TEXT,
+        uid TEXT
+    )
+'''
+
+SCHEMA_VERSION = 4
+
+SYNC_TRIGGERS = '''
+    CREATE TRIGGER IF NOT EXISTS tasks_sync_insert AFTER INSERT ON tasks
+    WHEN (SELECT value FROM settings WHERE key = 'sync_applying') IS NOT '1'
+    BEGIN
+        UPDATE tasks SET uid = lower(hex(randomblob(16))) WHERE id = NEW.id AND uid IS NULL;
+        UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'sync_clock';
+        INSERT OR REPLACE INTO change_log (uid, op, clock, node)
+        VALUES ((SELECT uid FROM tasks WHERE id = NEW.id), 'upsert',
+                (SELECT CAST(value AS INTEGER) FROM settings WHERE key = 'sync_clock'),
+                (SELECT value FROM settings WHERE key = 'sync_node'));
+    END;
+    CREATE TRIGGER IF NOT EXISTS tasks_sync_update AFTER UPDATE ON tasks
+    WHEN (SELECT value FROM settings WHERE key = 'sync_applying') IS NOT '1' AND NEW.uid IS NOT NULL
+    BEGIN
+        UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'sync_clock';
+        INSERT OR REPLACE INTO change_log (uid, op, clock, node)
+        VALUES (NEW.uid, 'upsert',
+                (SELECT CAST(value AS INTEGER) FROM settings WHERE key = 'sync_clock'),
+                (SELECT value FROM settings WHERE key = 'sync_node'));
+    END;
+    CREATE TRIGGER IF NOT EXISTS tasks_sync_delete AFTER DELETE ON tasks
+    WHEN (SELECT value FROM settings WHERE key = 'sync_applying') IS NOT '1' AND OLD.uid IS NOT NULL
+    BEGIN
+        UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'sync_clock';
+        INSERT OR REPLACE INTO change_log (uid, op, clock, node)
+        VALUES (OLD.uid, 'delete',
+                (SELECT CAST(value AS INTEGER) FROM settings WHERE key = 'sync_clock'),
+                (SELECT value FROM settings WHERE key = 'sync_node'));
+    END;
+'''
+
+ARCHIVE_SYNC_TRIGGERS = '''
+    CREATE TEMP TRIGGER IF NOT EXISTS archive_sync_update AFTER UPDATE ON archive.tasks
+    WHEN (SELECT value FROM settings WHERE key = 'sync_applying') IS NOT '1' AND NEW.uid IS NOT NULL
+    BEGIN
+        UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'sync_clock';
+        INSERT OR REPLACE INTO change_log (uid, op, clock, node)
+        VALUES (NEW.uid, 'upsert',
+                (SELECT CAST(value AS INTEGER) FROM settings WHERE key = 'sync_clock'),
+                (SELECT value FROM settings WHERE key = 'sync_node'));
+    END;
+    CREATE TEMP TRIGGER IF NOT EXISTS archive_sync_delete AFTER DELETE ON archive.tasks
+    WHEN (SELECT value FROM settings WHERE key = 'sync_applying') IS NOT '1' AND OLD.uid IS NOT NULL
+    BEGIN
+        UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = 'sync_clock';
+        INSERT OR REPLACE INTO change_log (uid, op, clock, node)
+        VALUES (OLD.uid, 'delete',
+                (SELECT CAST(value AS INTEGER) FROM settings WHERE key = 'sync_clock'),
+                (SELECT value FROM settings WHERE key = 'sync_node'));
+    END;
+'''
+
+MAINTENANCE_JOBS = ('archive', 'attachments', 'vacuum', 'analyze', 'optimize')
+
+RECURRENCE_DELTAS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+    'monthly': timedelta(days=30),
+    'yearly': timedelta(days=365)
+}
+
+PRIORITIES = {3: 'High', 2: 'Medium', 1: 'Low'}
+DEFAULT_PRIORITY = 2
+RECURRENCE_TYPES = {'daily': 'Daily', 'weekly': 'Weekly', 'monthly': 'Monthly', 'yearly': 'Yearly'}
+STATUSES = {'pending': 'Pending', 'completed': 'Completed'}
+DEFAULT_CATEGORIES = {'work': 'Work', 'personal': 'Personal', 'study': 'Study', 'exercise': 'Exercise', 'other': 'Other'}
+CATEGORY_COLORS = ('#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEEAD')
+TASK_ORDERS = {'time': 'time, id', 'priority': 'priority DESC, time, id'}
+TASK_INDEXES = {
+    'idx_tasks_date_time': 'date, time',
+    'idx_tasks_title_date': 'title, date',
+    'idx_tasks_date_priority': 'date, priority DESC, time',
+    'idx_tasks_status_date_time': 'status, date, time',
+    'idx_tasks_category_date': 'category, date'
+}
+
+def code_labels(codes):
+    for code, name in codes.items():
+        yield str(code), code
+        for strings in TRANSLATIONS.values():
+            yield strings.get(name, name), code
+
+ICS_PRIORITIES = {3: 1, 2: 5, 1: 9}
+
+ROLLOVER_POLICIES = ('off', 'move', 'clone')
+
+TASK_YEARS = range(1900, 2200)
+JALALI_TABLE_YEARS = 20
+ATTACHMENT_GRACE_PERIOD = timedelta(days=1)
+
+ICS_FREQUENCIES = {'DAILY': 1, 'WEEKLY': 7, 'MONTHLY': 30, 'YEARLY': 365}
+
+class ImportReport(NamedTuple):
+    rows: int
+    inserted: int
+    duplicates: int
+    errors: list
+    cancelled: bool = False
+
+class ImportCancelled(Exception):
+    pass
+
+class Task(NamedTuple):
+    id: int
+    title: str = None
+    description: str = None
+    date: str = None
+    time: str = None
+    priority: int = None
+    category: str = None
+    is_recurring: bool = None
+    recurring_type: str = None
+    status: str = None
+    created_at: str = None
+    updated_at: str = None
+    notes: str = None
+    attachment_path: str = None
+    uid: str = None
+
+TASK_DETAIL_COLUMNS = Task._fields
+TASK_LIST_COLUMNS = ('id', 'title', 'date', 'time', 'priority', 'category', 'is_recurring', 'recurring_type', 'status', 'attachment_path')
+TASK_REMINDER_COLUMNS = ('id', 'title', 'time', 'status')
+
+def task_factory(cursor, row):
+    return Task(**dict(zip([column[0] for column in cursor.description], row)))
+
+# Jalali calendar
+def gregorian_to_jalali(gy, gm, gd):
+    days = 355666 + 365 * gy + (gy + (gm > 2) + 3) // 4 - (gy + (gm > 2) + 99) // 100 + (gy + (gm > 2) + 399) // 400
+    days += gd + (0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334)[gm - 1]
+    jy = -1595 + 33 * (days // 12053)
+    days %= 12053
+    jy += 4 * (days // 1461)
+    days %= 1461
+    if days > 365:
+        jy += (days - 1) // 365
+        days = (days - 1) % 365
+    if days < 186:
+        return jy, 1 + days // 31, 1 + days % 31
+    return jy, 7 + (days - 186) // 30, 1 + (days - 186) % 30
+
+def jalali_to_gregorian(jy, jm, jd):
+    jy += 1595
+    days = -355668 + 365 * jy + (jy // 33) * 8 + (jy % 33 + 3) // 4 + jd
+    days += (jm - 1) * 31 if jm < 7 else (jm - 7) * 30 + 186
+    return Date.fromordinal(days - 365)
+
+class JalaliCalendar:
+    def __init__(self, first_year, last_year, month_names=None):
+        self.first = Date(first_year, 1, 1).toordinal()
+        last = Date(last_year, 12, 31).toordinal()
+        self.first_month = gregorian_to_jalali(first_year, 1, 1)[0] * 12
+        self.years = array('H')
+        self.months = array('B')
+        self.days = array('B')
+        self.month_starts = array('I', bytes(4 * 12 * (last_year - first_year + 2)))
+        for ordinal in range(self.first, last + 1):
+            date = Date.fromordinal(ordinal)
+            jy, jm, jd = gregorian_to_jalali(date.year, date.month, date.day)
+            self.years.append(jy)
+            self.months.append(jm)
+            self.days.append(jd)
+            if jd == 1:
+                self.month_starts[jy * 12 + jm - 1 - self.first_month] = ordinal
+        self.month_names = month_names or tuple(str(month) for month in range(1, 13))
+
+    def to_jalali(self, date):
+        offset = date.toordinal() - self.first
+        if 0 <= offset < len(self.years):
+            return self.years[offset], self.months[offset], self.days[offset]
+        return gregorian_to_jalali(date.year, date.month, date.day)
+
+    def month_range(self, jy, jm):
+        index = jy * 12 + jm - 1 - self.first_month
+        if 0 <= index < len(self.month_starts) - 1 and self.month_starts[index] and self.month_starts[index + 1]:
+            return Date.fromordinal(self.month_starts[index]), Date.fromordinal(self.month_starts[index + 1] - 1)
+        following = jalali_to_gregorian(jy + jm // 12, jm % 12 + 1, 1)
+        return jalali_to_gregorian(jy, jm, 1), following - timedelta(days=1)
+
+    def year_range(self, jy):
+        return self.month_range(jy, 1)[0], self.month_range(jy, 12)[1]
+
+    def format(self, date):
+        jy, jm, jd = self.to_jalali(date)
+        return f'{jd} {self.month_names[jm - 1]} {jy}'
+
 class Database:
-    def __init__(self):
-        self.db_path = 'tasks.db'
-        self.conn = sqlite3.connect(self.db_path)
+    def __init__(self, db_path='tasks.db'):
+        self.db_path = db_path
+        self.archive_path = os.path.splitext(self.db_path)[0] + '_archive.db'
+        self.connect()
         self.create_tables()
+        self.attachments = AttachmentStore(self, os.path.join(os.path.dirname(self.db_path), 'attachments'))
+
+    def connect(self):
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        self.conn.execute('ATTACH DATABASE ? AS archive', (self.archive_path,))
+        self.conn.execute('PRAGMA archive.auto_vacuum = INCREMENTAL')
 
     def create_tables(self):
         cursor = self.conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                date TEXT NOT NULL,
-                time TEXT,
-                priority TEXT,
-                category TEXT,
-                is_recurring BOOLEAN,
-                recurring_type TEXT,
-                status TEXT,
-                created_at TEXT,
-                updated_at TEXT,
-                notes TEXT,
-                attachment_path TEXT
-            )
-        ''')
+        cursor.execute(TASKS_TABLE.format(name='main.tasks', autoincrement=' AUTOINCREMENT'))
+        cursor.execute(TASKS_TABLE.format(name='archive.tasks', autoincrement=''))
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS history (
                 date TEXT PRIMARY KEY,
                 completion_percentage REAL,
                 task_ids TEXT,
                 total_tasks INTEGER,
-                completed_tasks INTEGER
+                completed_tasks INTEGER,
+                rolled_over INTEGER NOT NULL DEFAULT 0
             )
         ''')
         cursor.execute('''
@@ -63,108 +361,459 @@ class Database:
         ''')
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT PRIMARY KEY,
+                color TEXT,
+                position INTEGER
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS category_names (
+                key TEXT NOT NULL,
+                language TEXT NOT NULL,
                 name TEXT NOT NULL,
-                color TEXT
+                PRIMARY KEY (key, language)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS attachments (
+                digest TEXT PRIMARY KEY,
+                name TEXT,
+                size INTEGER,
+                created_at TEXT
             )
         ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT UNIQUE NOT NULL,
+                op TEXT NOT NULL,
+                clock INTEGER NOT NULL,
+                node TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_peers (
+                peer TEXT PRIMARY KEY,
+                position INTEGER
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('sync_node', ?)", (uuid.uuid4().hex,))
+        cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('sync_clock', '0')")
+        cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('sync_applying', '0')")
+        self.migrate()
+        cursor.execute('DROP INDEX IF EXISTS main.idx_tasks_date')
+        cursor.execute('DROP INDEX IF EXISTS archive.idx_tasks_date')
+        cursor.execute('DROP INDEX IF EXISTS main.idx_tasks_status_date')
+        cursor.execute('DROP INDEX IF EXISTS archive.idx_tasks_status_date')
+        for schema in ('main', 'archive'):
+            for index, columns in TASK_INDEXES.items():
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.{index} ON tasks({columns})')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS main.idx_tasks_uid ON tasks(uid)')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_tasks_uid ON tasks(uid)')
+        cursor.execute('''
+            CREATE TEMP VIEW IF NOT EXISTS all_tasks AS
+            SELECT * FROM main.tasks UNION ALL SELECT * FROM archive.tasks
+        ''')
+        cursor.executescript(SYNC_TRIGGERS)
+        cursor.executescript(ARCHIVE_SYNC_TRIGGERS)
         self.conn.commit()
 
+    def migrate(self):
+        cursor = self.conn.cursor()
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        if version < 1:
+            for schema in ('main', 'archive'):
+                columns = [row[1] for row in cursor.execute(f'PRAGMA {schema}.table_info(tasks)').fetchall()]
+                if 'uid' not in columns:
+                    cursor.execute(f'ALTER TABLE {schema}.tasks ADD COLUMN uid TEXT')
+                cursor.execute(f'UPDATE {schema}.tasks SET uid = lower(hex(randomblob(16))) WHERE uid IS NULL')
+            cursor.execute('''
+                INSERT OR IGNORE INTO change_log (uid, op, clock, node)
+                SELECT uid, 'upsert', 1, (SELECT value FROM settings WHERE key = 'sync_node') FROM main.tasks
+            ''')
+            cursor.execute("UPDATE settings SET value = MAX(CAST(value AS INTEGER), 1) WHERE key = 'sync_clock'")
+        if version < 2:
+            cursor.execute('CREATE TEMP TABLE IF NOT EXISTS label_codes (kind TEXT, label TEXT, code, PRIMARY KEY (kind, label))')
+            for kind, codes in (('priority', PRIORITIES), ('recurring_type', RECURRENCE_TYPES), ('status', STATUSES)):
+                cursor.executemany('INSERT OR IGNORE INTO temp.label_codes (kind, label, code) VALUES (?, ?, ?)',
+                                   [(kind, label, code) for label, code in code_labels(codes)])
+            for schema in ('main', 'archive'):
+                columns = {row[1]: row[2] for row in cursor.execute(f'PRAGMA {schema}.table_info(tasks)').fetchall()}
+                if columns['priority'] == 'INTEGER':
+                    continue
+                cursor.execute(TASKS_TABLE.format(name=f'{schema}.tasks_migrated', autoincrement=' AUTOINCREMENT' if schema == 'main' else ''))
+                cursor.execute(f'''
+                    INSERT INTO {schema}.tasks_migrated ({", ".join(TASK_DETAIL_COLUMNS)})
+                    SELECT id, title, description, date, time,
+                           COALESCE((SELECT code FROM temp.label_codes WHERE kind = 'priority' AND label = priority), {DEFAULT_PRIORITY}),
+                           category, is_recurring,
+                           CASE WHEN is_recurring THEN COALESCE(
+                               (SELECT code FROM temp.label_codes WHERE kind = 'recurring_type' AND label = recurring_type), 'daily') END,
+                           COALESCE((SELECT code FROM temp.label_codes WHERE kind = 'status' AND label = status), 'pending'),
+                           created_at, updated_at, notes, attachment_path, uid
+                    FROM {schema}.tasks
+                ''')
+                cursor.execute(f'DROP TABLE {schema}.tasks')
+                cursor.execute(f'ALTER TABLE {schema}.tasks_migrated RENAME TO tasks')
+            cursor.execute('DROP TABLE temp.label_codes')
+        if version < 3:
+            self.migrate_categories()
+        if version < 4 and 'rolled_over' not in [row[1] for row in cursor.execute('PRAGMA table_info(history)').fetchall()]:
+            cursor.execute('ALTER TABLE history ADD COLUMN rolled_over INTEGER NOT NULL DEFAULT 0')
+        if version < SCHEMA_VERSION:
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.commit()
+
+    def migrate_categories(self):
+        cursor = self.conn.cursor()
+        cursor.execute("UPDATE settings SET value = '1' WHERE key = 'sync_applying'")
+        legacy = []
+        if 'name' in [row[1] for row in cursor.execute('PRAGMA table_info(categories)').fetchall()]:
+            legacy = cursor.execute('SELECT name, color FROM categories ORDER BY id').fetchall()
+            cursor.execute('DROP TABLE categories')
+            cursor.execute('CREATE TABLE categories (key TEXT PRIMARY KEY, color TEXT, position INTEGER)')
+        labels = dict(code_labels(DEFAULT_CATEGORIES))
+        categories = list(zip(DEFAULT_CATEGORIES, CATEGORY_COLORS)) + [(labels.get(name, name), color) for name, color in legacy]
+        cursor.executemany('''
+            INSERT OR IGNORE INTO categories (key, color, position)
+            VALUES (?, ?, (SELECT IFNULL(MAX(position), -1) + 1 FROM categories))
+        ''', categories)
+        cursor.executemany('INSERT OR IGNORE INTO category_names (key, language, name) VALUES (?, ?, ?)',
+                           [(key, language, strings.get(name, name))
+                            for key, name in DEFAULT_CATEGORIES.items() for language, strings in TRANSLATIONS.items()])
+        cursor.execute('CREATE TEMP TABLE category_labels (label TEXT PRIMARY KEY, key TEXT)')
+        cursor.executemany('INSERT OR IGNORE INTO temp.category_labels (label, key) VALUES (?, ?)', labels.items())
+        for schema in ('main', 'archive'):
+            cursor.execute(f'''
+                UPDATE {schema}.tasks SET category = (SELECT key FROM temp.category_labels WHERE label = category)
+                WHERE category IN (SELECT label FROM temp.category_labels)
+            ''')
+        cursor.execute('DROP TABLE temp.category_labels')
+        rules = json.loads(self.get_setting('rollover_rules', '{}'))
+        cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('rollover_rules', ?)",
+                       (json.dumps({labels.get(name, name): rule for name, rule in rules.items()}),))
+        self.register_task_categories()
+        cursor.execute("UPDATE settings SET value = '0' WHERE key = 'sync_applying'")
+
     def add_task(self, title, description, date, time, priority, category, is_recurring, recurring_type, notes, attachment_path):
         cursor = self.conn.cursor()
         created_at = datetime.now().isoformat()
         cursor.execute('''
-            INSERT INTO tasks (title, description, date, time, priority, category, is_recurring, recurring_type, status, created_at, updated_at, notes, attachment_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (title, description, date, time, priority, category, is_recurring, recurring_type, 'pending', created_at, created_at, notes, attachment_path))
+            INSERT INTO tasks (title, description, date, time, priority, category, is_recurring, recurring_type, status, created_at, updated_at, notes, attachment_path, uid)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (title, description, date, time, priority, category, is_recurring, recurring_type, 'pending', created_at, created_at, notes, attachment_path, uuid.uuid4().hex))
         self.conn.commit()
         task_id = cursor.lastrowid
         if is_recurring:
-            self.add_recurring_tasks(task_id, date, recurring_type, title, description, time, priority, category, notes, attachment_path)
+            self.add_recurring_tasks(task_id, date, recurring_type, title, description, time, priority, category, notes, attachment_path, created_at)
         return task_id
 
-    def add_recurring_tasks(self, task_id, start_date, recurring_type, title, description, time, priority, category, notes, attachment_path):
+    def add_recurring_tasks(self, task_id, start_date, recurring_type, title, description, time, priority, category, notes, attachment_path, created_at):
         cursor = self.conn.cursor()
         start = pendulum.parse(start_date)
         end = start.add(years=9)
-        delta = {
-            'daily': timedelta(days=1),
-            'weekly': timedelta(weeks=1),
-            'monthly': timedelta(days=30),
-            'yearly': timedelta(days=365)
-        }.get(recurring_type, timedelta(days=1))
-        current = start.add(days=1)
-        created_at = datetime.now().isoformat()
+        delta = RECURRENCE_DELTAS.get(recurring_type, timedelta(days=1))
+        current = start + delta
         while current <= end:
             cursor.execute('''
-                INSERT INTO tasks (title, description, date, time, priority, category, is_recurring, recurring_type, status, created_at, updated_at, notes, attachment_path)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (title, description, current.to_date_string(), time, priority, category, True, recurring_type, 'pending', created_at, created_at, notes, attachment_path))
+                INSERT INTO tasks (title, description, date, time, priority, category, is_recurring, recurring_type, status, created_at, updated_at, notes, attachment_path, uid)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (title, description, current.to_date_string(), time, priority, category, True, recurring_type, 'pending', created_at, created_at, notes, attachment_path, uuid.uuid4().hex))
             current = current + delta
         self.conn.commit()
 
-    def get_tasks(self, date):
+    def task_cursor(self):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM tasks WHERE date = ?', (date,))
+        cursor.row_factory = task_factory
+        return cursor
+
+    # Ranges that stay after the newest archived date read main.tasks alone
+    def task_source(self, start):
+        cursor = self.conn.cursor()
+        archive_end = cursor.execute('SELECT MAX(date) FROM archive.tasks').fetchone()[0]
+        return 'all_tasks' if archive_end and (not start or start <= archive_end) else 'tasks'
+
+    def archive_cutoff(self, horizon_days=None):
+        if horizon_days is None:
+            horizon_days = int(self.get_setting('archive_horizon_days', '90'))
+        return (datetime.now() - timedelta(days=horizon_days)).strftime('%Y-%m-%d')
+
+    def restore_archived(self, where, params=()):
+        cursor = self.conn.cursor()
+        cursor.execute("UPDATE settings SET value = '1' WHERE key = 'sync_applying'")
+        cursor.execute(f'INSERT INTO main.tasks SELECT * FROM archive.tasks WHERE {where}', params)
+        cursor.execute(f'DELETE FROM archive.tasks WHERE {where}', params)
+        cursor.execute("UPDATE settings SET value = '0' WHERE key = 'sync_applying'")
+
+    def get_tasks(self, date, columns=TASK_LIST_COLUMNS, order='time', **filters):
+        cursor = self.task_cursor()
+        where, params = self.task_filter(**filters)
+        cursor.execute(f'SELECT {", ".join(columns)} FROM {self.task_source(date)} WHERE date = ? AND {where} ORDER BY {TASK_ORDERS[order]}',
+                       [date] + params)
+        return cursor.fetchall()
+
+    def get_task(self, task_id, columns=TASK_DETAIL_COLUMNS):
+        cursor = self.task_cursor()
+        cursor.execute(f'SELECT {", ".join(columns)} FROM all_tasks WHERE id = ?', (task_id,))
+        return cursor.fetchone()
+
+    def get_tasks_by_ids(self, task_ids, columns=TASK_LIST_COLUMNS):
+        cursor = self.task_cursor()
+        cursor.execute(f'SELECT {", ".join(columns)} FROM all_tasks WHERE id IN (SELECT value FROM json_each(?)) ORDER BY time, id',
+                       (json.dumps([int(task_id) for task_id in task_ids]),))
         return cursor.fetchall()
 
-    def get_all_tasks(self):
+    def get_due_tasks(self, date, time):
+        cursor = self.task_cursor()
+        cursor.execute(f'''
+            SELECT {", ".join(TASK_REMINDER_COLUMNS)} FROM tasks
+            WHERE date = ? AND status = 'pending' AND time != '' AND time <= ?
+        ''', (date, time))
+        return cursor.fetchall()
+
+    def task_filter(self, start=None, end=None, category=None, status=None, is_recurring=None, priority=None):
+        clauses, params = [], []
+        if start:
+            clauses.append('date >= ?')
+            params.append(start)
+        if end:
+            clauses.append('date <= ?')
+            params.append(end)
+        if category is not None:
+            clauses.append('category = ?')
+            params.append(category)
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if is_recurring is not None:
+            clauses.append('is_recurring' if is_recurring else 'NOT is_recurring')
+        if priority:
+            clauses.append('priority = ?')
+            params.append(priority)
+        return ' AND '.join(clauses) or '1', params
+
+    def count_tasks(self, **filters):
+        cursor = self.conn.cursor()
+        where, params = self.task_filter(**filters)
+        cursor.execute(f'SELECT COUNT(*) FROM all_tasks WHERE {where}', params)
+        return cursor.fetchone()[0]
+
+    def iter_tasks(self, columns=TASK_DETAIL_COLUMNS, batch_size=500, **filters):
+        cursor = self.task_cursor()
+        where, params = self.task_filter(**filters)
+        cursor.execute(f'SELECT {", ".join(columns)} FROM all_tasks WHERE {where} ORDER BY date, time, id', params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    # A series is the set of occurrences created together by add_task or a single imported event
+    def iter_recurring_series(self, batch_size=500, **filters):
+        cursor = self.task_cursor()
+        where, params = self.task_filter(is_recurring=True, **filters)
+        cursor.execute(f'''
+            SELECT {", ".join(TASK_DETAIL_COLUMNS)} FROM all_tasks WHERE {where}
+            ORDER BY created_at, title, recurring_type, time, date
+        ''', params)
+        tasks = (task for rows in iter(lambda: cursor.fetchmany(batch_size), []) for task in rows)
+        for _, series in groupby(tasks, key=lambda task: (task.created_at, task.title, task.recurring_type, task.time)):
+            yield list(series)
+
+    def iter_history(self, batch_size=500):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM tasks ORDER BY date')
+        cursor.execute('SELECT date, completion_percentage, task_ids, total_tasks, completed_tasks FROM history ORDER BY date')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def get_agenda_page(self, start=None, end=None, status=None, after=None, limit=50, columns=TASK_LIST_COLUMNS):
+        cursor = self.task_cursor()
+        clauses, params = [], []
+        if after:
+            clauses.append('(date, time, id) > (?, ?, ?)')
+            params.extend(after)
+        elif start:
+            clauses.append('date >= ?')
+            params.append(start)
+        if end:
+            clauses.append('date <= ?')
+            params.append(end)
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        cursor.execute(f'''
+            SELECT {", ".join(columns)} FROM {self.task_source(after[0] if after else start)} WHERE {' AND '.join(clauses) or '1'}
+            ORDER BY date, time, id LIMIT ?
+        ''', params + [limit])
+        return cursor.fetchall()
+
+    def get_all_tasks(self, columns=TASK_LIST_COLUMNS):
+        cursor = self.task_cursor()
+        cursor.execute(f'SELECT {", ".join(columns)} FROM tasks ORDER BY date')
         return cursor.fetchall()
 
     def update_task_status(self, task_id, status):
         cursor = self.conn.cursor()
-        cursor.execute('UPDATE tasks SET status = ?, updated_at = ? WHERE id = ?', (status, datetime.now().isoformat(), task_id))
+        for schema in ('main', 'archive'):
+            cursor.execute(f'UPDATE {schema}.tasks SET status = ?, updated_at = ? WHERE id = ?', (status, datetime.now().isoformat(), task_id))
         self.conn.commit()
 
     def update_task(self, task_id, title, description, time, priority, category, notes, attachment_path):
         cursor = self.conn.cursor()
-        cursor.execute('''
-            UPDATE tasks SET title = ?, description = ?, time = ?, priority = ?, category = ?, notes = ?, attachment_path = ?, updated_at = ?
-            WHERE id = ?
-        ''', (title, description, time, priority, category, notes, attachment_path, datetime.now().isoformat(), task_id))
+        for schema in ('main', 'archive'):
+            cursor.execute(f'''
+                UPDATE {schema}.tasks SET title = ?, description = ?, time = ?, priority = ?, category = ?, notes = ?, attachment_path = ?, updated_at = ?
+                WHERE id = ?
+            ''', (title, description, time, priority, category, notes, attachment_path, datetime.now().isoformat(), task_id))
         self.conn.commit()
 
     def delete_task(self, task_id, all_future=False):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT date, is_recurring, recurring_type, title FROM tasks WHERE id = ?', (task_id,))
-        task = cursor.fetchone()
-        if all_future and task[1]:
-            cursor.execute('DELETE FROM tasks WHERE title = ? AND is_recurring = ? AND date >= ?',
-                          (task[3], 1, task[0]))
-        else:
-            cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+        task = self.get_task(task_id, ('id', 'date', 'is_recurring', 'recurring_type', 'title'))
+        for schema in ('main', 'archive'):
+            if all_future and task.is_recurring:
+                cursor.execute(f'DELETE FROM {schema}.tasks WHERE title = ? AND is_recurring = ? AND date >= ?',
+                              (task.title, 1, task.date))
+            else:
+                cursor.execute(f'DELETE FROM {schema}.tasks WHERE id = ?', (task_id,))
         self.conn.commit()
 
+    def update_tasks(self, task_ids, assignments, params, extra_dates=()):
+        cursor = self.conn.cursor()
+        task_ids = json.dumps([int(task_id) for task_id in task_ids])
+        with self.conn:
+            cursor.execute('SELECT DISTINCT date FROM all_tasks WHERE id IN (SELECT value FROM json_each(?))', (task_ids,))
+            dates = [row[0] for row in cursor.fetchall()] + list(extra_dates)
+            for schema in ('main', 'archive'):
+                if assignments is None:
+                    cursor.execute(f'DELETE FROM {schema}.tasks WHERE id IN (SELECT value FROM json_each(?))', (task_ids,))
+                else:
+                    cursor.execute(f'UPDATE {schema}.tasks SET {assignments}, updated_at = ? WHERE id IN (SELECT value FROM json_each(?))',
+                                   tuple(params) + (datetime.now().isoformat(), task_ids))
+            self.restore_archived('date >= ?', (self.archive_cutoff(),))
+            self.rebuild_history(dates)
+        return dates
+
+    def bulk_update_status(self, task_ids, status):
+        return self.update_tasks(task_ids, 'status = ?', (status,))
+
+    def bulk_reschedule(self, task_ids, date):
+        return self.update_tasks(task_ids, 'date = ?', (date,), (date,))
+
+    def bulk_set_category(self, task_ids, category):
+        return self.update_tasks(task_ids, 'category = ?', (category,))
+
+    def bulk_delete(self, task_ids):
+        return self.update_tasks(task_ids, None, ())
+
+    def rebuild_history(self, dates):
+        cursor = self.conn.cursor()
+        # Days whose tasks were moved by a rollover keep the snapshot taken before the move
+        cursor.execute('''
+            SELECT json_group_array(value) FROM json_each(?)
+            WHERE value NOT IN (SELECT date FROM history WHERE rolled_over)
+        ''', (json.dumps(sorted(set(dates))),))
+        dates = cursor.fetchone()[0]
+        cursor.execute('''
+            INSERT OR REPLACE INTO history (date, completion_percentage, task_ids, total_tasks, completed_tasks)
+            SELECT date, 100.0 * SUM(status = 'completed') / COUNT(*), group_concat(id), COUNT(*), SUM(status = 'completed')
+            FROM all_tasks WHERE date IN (SELECT value FROM json_each(?)) GROUP BY date
+        ''', (dates,))
+        cursor.execute('''
+            DELETE FROM history WHERE date IN (SELECT value FROM json_each(?))
+            AND date NOT IN (SELECT date FROM all_tasks WHERE date IN (SELECT value FROM json_each(?)))
+        ''', (dates, dates))
+
+    def rollover_tasks(self, today, policy, rules):
+        cursor = self.conn.cursor()
+        last_run = self.get_setting('rollover_last_run', '')
+        rules = json.dumps(rules)
+        policy_of = 'IFNULL((SELECT value FROM json_each(:rules) WHERE key = tasks.category), :policy)'
+        overdue = f"status = 'pending' AND NOT is_recurring AND date < :today AND {policy_of}"
+        params = {'today': today, 'last_run': last_run, 'rules': rules, 'policy': policy, 'now': datetime.now().isoformat()}
+        with self.conn:
+            self.restore_archived(f"{overdue} = 'move'", params)
+            cursor.execute(f"SELECT DISTINCT date FROM tasks WHERE {overdue} = 'move'", params)
+            moved_dates = [row[0] for row in cursor.fetchall()]
+            cursor.execute(f"SELECT DISTINCT date FROM tasks WHERE {overdue} = 'clone' AND date >= :last_run", params)
+            self.rebuild_history(moved_dates + [row[0] for row in cursor.fetchall()])
+            cursor.execute('UPDATE history SET rolled_over = 1 WHERE date IN (SELECT value FROM json_each(?))', (json.dumps(moved_dates),))
+            cursor.execute(f'''
+                INSERT INTO tasks (title, description, date, time, priority, category, is_recurring, recurring_type, status, created_at, updated_at, notes, attachment_path, uid)
+                SELECT title, description, :today, time, priority, category, is_recurring, recurring_type, 'pending', :now, :now, notes, attachment_path, lower(hex(randomblob(16)))
+                FROM tasks WHERE {overdue} = 'clone' AND date >= :last_run
+            ''', params)
+            cloned = cursor.rowcount
+            cursor.execute(f"UPDATE tasks SET date = :today, updated_at = :now WHERE {overdue} = 'move'", params)
+            moved = cursor.rowcount
+            cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('rollover_last_run', ?)", (today,))
+        return moved, cloned
+
+    def get_first_date(self):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT MIN(date) FROM (
+                SELECT MIN(date) AS date FROM main.tasks UNION ALL SELECT MIN(date) FROM archive.tasks
+                UNION ALL SELECT MIN(date) FROM history
+            )
+        ''')
+        return cursor.fetchone()[0]
+
+    def get_daily_completion(self, start, end):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT date, total_tasks, completed_tasks FROM history WHERE date BETWEEN :start AND :end
+            UNION ALL
+            SELECT date, COUNT(*), SUM(status = 'completed') FROM all_tasks
+            WHERE date BETWEEN :start AND :end AND date NOT IN (SELECT date FROM history WHERE date BETWEEN :start AND :end)
+            GROUP BY date
+        ''', {'start': start, 'end': end})
+        return cursor.fetchall()
+
     def get_history(self):
         cursor = self.conn.cursor()
         cursor.execute('SELECT * FROM history ORDER BY date DESC')
         return cursor.fetchall()
 
     def update_history(self, date):
+        self.rebuild_history([date])
+        self.conn.commit()
+
+    def add_category(self, key, color, names=None):
         cursor = self.conn.cursor()
-        tasks = self.get_tasks(date)
-        if tasks:
-            total_tasks = len(tasks)
-            completed_tasks = sum(1 for task in tasks if task[9] == 'completed')
-            percentage = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-            task_ids = ','.join(str(task[0]) for task in tasks)
-            cursor.execute('''
-                INSERT OR REPLACE INTO history (date, completion_percentage, task_ids, total_tasks, completed_tasks)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (date, percentage, task_ids, total_tasks, completed_tasks))
-            self.conn.commit()
+        cursor.execute('''
+            INSERT OR IGNORE INTO categories (key, color, position)
+            VALUES (?, ?, (SELECT IFNULL(MAX(position), -1) + 1 FROM categories))
+        ''', (key, color))
+        cursor.executemany('INSERT OR REPLACE INTO category_names (key, language, name) VALUES (?, ?, ?)',
+                           [(key, language, name) for language, name in (names or {}).items()])
+        self.conn.commit()
 
-    def add_category(self, name, color):
+    def set_category_color(self, key, color):
         cursor = self.conn.cursor()
-        cursor.execute('INSERT OR REPLACE INTO categories (name, color) VALUES (?, ?)', (name, color))
+        cursor.execute('UPDATE categories SET color = ? WHERE key = ?', (color, key))
         self.conn.commit()
 
     def get_categories(self):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT name FROM categories')
-        return [row[0] for row in cursor.fetchall()]
+        cursor.execute('''
+            SELECT c.key, c.color, n.language, n.name FROM categories c
+            LEFT JOIN category_names n ON n.key = c.key ORDER BY c.position, c.key
+        ''')
+        return cursor.fetchall()
+
+    def register_task_categories(self):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO categories (key, position)
+            SELECT category, (SELECT IFNULL(MAX(position), -1) + 1 FROM categories) FROM (
+                SELECT category FROM main.tasks WHERE category != '' UNION SELECT category FROM archive.tasks WHERE category != ''
+            )
+        ''')
+        return cursor.rowcount
 
     def save_setting(self, key, value):
         cursor = self.conn.cursor()
@@ -177,26 +826,837 @@ class Database:
         result = cursor.fetchone()
         return result[0] if result else default
 
-    def search_tasks(self, query):
+    def add_attachment(self, digest, name, size):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO attachments (digest, name, size, created_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (digest) DO UPDATE SET created_at = excluded.created_at
+        ''', (digest, name, size, datetime.now().isoformat()))
+        self.conn.commit()
+
+    def get_attachment(self, digest):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT name, size FROM attachments WHERE digest = ?', (digest,))
+        return cursor.fetchone()
+
+    def get_unreferenced_attachments(self, created_before):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM tasks WHERE title LIKE ? OR description LIKE ?', (f'%{query}%', f'%{query}%'))
+        cursor.execute('''
+            SELECT digest FROM attachments
+            WHERE created_at < ? AND digest NOT IN (SELECT attachment_path FROM all_tasks WHERE attachment_path != '')
+        ''', (created_before,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def delete_attachments(self, digests):
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM attachments WHERE digest IN (SELECT value FROM json_each(?))', (json.dumps(digests),))
+        self.conn.commit()
+
+    def search_tasks(self, query, columns=TASK_LIST_COLUMNS, order='time', **filters):
+        cursor = self.task_cursor()
+        where, params = self.task_filter(**filters)
+        cursor.execute(f'''
+            SELECT {", ".join(columns)} FROM all_tasks WHERE (title LIKE ? OR description LIKE ?) AND {where}
+            ORDER BY date, {TASK_ORDERS[order]}
+        ''', [f'%{query}%', f'%{query}%'] + params)
         return cursor.fetchall()
 
+    def archive_tasks(self, horizon_days, batch_size=500):
+        cursor = self.conn.cursor()
+        cutoff = self.archive_cutoff(horizon_days)
+        with self.conn:
+            cursor.execute("UPDATE settings SET value = '1' WHERE key = 'sync_applying'")
+            cursor.execute('CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)')
+            cursor.execute('DELETE FROM temp.archive_batch')
+            cursor.execute('INSERT INTO temp.archive_batch SELECT id FROM main.tasks WHERE date < ? ORDER BY date LIMIT ?', (cutoff, batch_size))
+            cursor.execute('''
+                INSERT OR REPLACE INTO history (date, completion_percentage, task_ids, total_tasks, completed_tasks)
+                SELECT date, 100.0 * SUM(status = 'completed') / COUNT(*), group_concat(id), COUNT(*), SUM(status = 'completed')
+                FROM all_tasks
+                WHERE date IN (SELECT date FROM main.tasks WHERE id IN (SELECT id FROM temp.archive_batch))
+                AND date NOT IN (SELECT date FROM history WHERE rolled_over)
+                GROUP BY date
+            ''')
+            cursor.execute('INSERT INTO archive.tasks SELECT * FROM main.tasks WHERE id IN (SELECT id FROM temp.archive_batch)')
+            cursor.execute('DELETE FROM main.tasks WHERE id IN (SELECT id FROM temp.archive_batch)')
+            archived = cursor.rowcount
+            cursor.execute("UPDATE settings SET value = '0' WHERE key = 'sync_applying'")
+            return archived
+
+    def database_size(self):
+        cursor = self.conn.cursor()
+        size = 0
+        for schema in ('main', 'archive'):
+            page_size = cursor.execute(f'PRAGMA {schema}.page_size').fetchone()[0]
+            page_count = cursor.execute(f'PRAGMA {schema}.page_count').fetchone()[0]
+            size += page_size * page_count
+        return size
+
+    def schemas_needing_compaction(self):
+        cursor = self.conn.cursor()
+        return [schema for schema in ('main', 'archive') if cursor.execute(f'PRAGMA {schema}.auto_vacuum').fetchone()[0] != 2]
+
+    # Switching an existing file to incremental auto-vacuum needs one full VACUUM, so it only runs on request
+    def compact_database(self):
+        cursor = self.conn.cursor()
+        for schema in self.schemas_needing_compaction():
+            cursor.execute(f'PRAGMA {schema}.auto_vacuum = INCREMENTAL')
+            cursor.execute(f'VACUUM {schema}')
+
+    def incremental_vacuum(self, pages=256):
+        cursor = self.conn.cursor()
+        freed = 0
+        for schema in ('main', 'archive'):
+            if cursor.execute(f'PRAGMA {schema}.auto_vacuum').fetchone()[0] != 2:
+                continue
+            before = cursor.execute(f'PRAGMA {schema}.freelist_count').fetchone()[0]
+            cursor.execute(f'PRAGMA {schema}.incremental_vacuum({int(pages)})').fetchall()
+            freed += before - cursor.execute(f'PRAGMA {schema}.freelist_count').fetchone()[0]
+        return freed
+
+    def run_maintenance_step(self, job, horizon_days=90, batch_size=500, vacuum_pages=256):
+        started = perf_counter()
+        size_before = self.database_size()
+        rows = 0
+        if job == 'archive':
+            rows = self.archive_tasks(horizon_days, batch_size)
+        elif job == 'attachments':
+            rows = self.attachments.collect_garbage()
+        elif job == 'vacuum':
+            rows = self.incremental_vacuum(vacuum_pages)
+        elif job == 'analyze':
+            self.conn.execute('PRAGMA analysis_limit = 400')
+            self.conn.execute('ANALYZE')
+            self.conn.commit()
+        elif job == 'optimize':
+            self.conn.execute('PRAGMA optimize')
+        done = job in ('attachments', 'analyze', 'optimize') or rows < (batch_size if job == 'archive' else vacuum_pages)
+        return {
+            'job': job,
+            'rows': rows,
+            'done': done,
+            'reclaimed_bytes': max(size_before - self.database_size(), 0),
+            'elapsed_ms': (perf_counter() - started) * 1000
+        }
+
+    def get_peer_position(self, peer):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT position FROM sync_peers WHERE peer = ?', (peer,))
+        result = cursor.fetchone()
+        return result[0] if result else 0
+
+    def set_peer_position(self, peer, position):
+        cursor = self.conn.cursor()
+        cursor.execute('INSERT OR REPLACE INTO sync_peers (peer, position) VALUES (?, ?)', (peer, position))
+        self.conn.commit()
+
+    def export_changes(self, since):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT seq, uid, op, clock, node FROM change_log WHERE seq > ? ORDER BY seq', (since,))
+        rows = cursor.fetchall()
+        columns = [column for column in TASK_DETAIL_COLUMNS if column not in ('id', 'uid')]
+        changes = []
+        for seq, uid, op, clock, node in rows:
+            change = {'uid': uid, 'op': op, 'clock': clock, 'node': node, 'row': None, 'attachment': None}
+            if op == 'upsert':
+                task = self.get_task_by_uid(uid)
+                if task is None:
+                    continue
+                change['row'] = {column: getattr(task, column) for column in columns}
+                if task.attachment_path:
+                    change['attachment'] = self.get_attachment(task.attachment_path)
+            changes.append(change)
+        return changes, rows[-1][0] if rows else since
+
+    def get_task_by_uid(self, uid):
+        cursor = self.task_cursor()
+        cursor.execute(f'SELECT {", ".join(TASK_DETAIL_COLUMNS)} FROM all_tasks WHERE uid = ?', (uid,))
+        return cursor.fetchone()
+
+    def apply_changes(self, changes):
+        cursor = self.conn.cursor()
+        applied = 0
+        dates = set()
+        with self.conn:
+            cursor.execute("UPDATE settings SET value = '1' WHERE key = 'sync_applying'")
+            for change in changes:
+                cursor.execute('SELECT clock, node FROM change_log WHERE uid = ?', (change['uid'],))
+                local = cursor.fetchone()
+                if local and tuple(local) >= (change['clock'], change['node']):
+                    continue
+                cursor.execute('SELECT date FROM all_tasks WHERE uid = ?', (change['uid'],))
+                dates.update(row[0] for row in cursor.fetchall())
+                if change['op'] == 'delete':
+                    cursor.execute('DELETE FROM main.tasks WHERE uid = ?', (change['uid'],))
+                    cursor.execute('DELETE FROM archive.tasks WHERE uid = ?', (change['uid'],))
+                else:
+                    row = change['row']
+                    dates.add(row['date'])
+                    assignments = ', '.join(f'{column} = :{column}' for column in row)
+                    params = dict(row, uid=change['uid'])
+                    cursor.execute(f'UPDATE main.tasks SET {assignments} WHERE uid = :uid', params)
+                    if not cursor.rowcount:
+                        cursor.execute(f'UPDATE archive.tasks SET {assignments} WHERE uid = :uid', params)
+                    if not cursor.rowcount:
+                        cursor.execute(f'''
+                            INSERT INTO main.tasks ({", ".join(row)}, uid) VALUES ({", ".join(":" + column for column in row)}, :uid)
+                        ''', params)
+                    if change['attachment']:
+                        cursor.execute('INSERT OR IGNORE INTO attachments (digest, name, size, created_at) VALUES (?, ?, ?, ?)',
+                                       (row['attachment_path'], change['attachment'][0], change['attachment'][1], datetime.now().isoformat()))
+                cursor.execute('INSERT OR REPLACE INTO change_log (uid, op, clock, node) VALUES (?, ?, ?, ?)',
+                               (change['uid'], change['op'], change['clock'], change['node']))
+                cursor.execute("UPDATE settings SET value = MAX(CAST(value AS INTEGER), ?) WHERE key = 'sync_clock'", (change['clock'],))
+                applied += 1
+            self.restore_archived('date >= ?', (self.archive_cutoff(),))
+            self.rebuild_history(dates)
+            self.register_task_categories()
+            cursor.execute("UPDATE settings SET value = '0' WHERE key = 'sync_applying'")
+        return applied
+
+    def pull_changes(self, source):
+        since = self.get_peer_position(source.node)
+        changes, position = source.export_changes(since)
+        applied = self.apply_changes(changes)
+        self.set_peer_position(source.node, position)
+        self.attachments.copy_objects(source.attachments.objects_dir, self.attachments.objects_dir)
+        return applied
+
+    @property
+    def node(self):
+        return self.get_setting('sync_node')
+
+    def sync_with(self, path):
+        if os.path.isdir(path):
+            return self.sync_with_directory(path)
+        peer = Database(path)
+        try:
+            if peer.node == self.node:
+                peer.save_setting('sync_node', uuid.uuid4().hex)
+            pulled = self.pull_changes(peer)
+            pushed = peer.pull_changes(self)
+        finally:
+            peer.conn.close()
+        return pulled, pushed
+
+    def sync_with_directory(self, path):
+        path = os.path.abspath(path)
+        attachments_dir = os.path.join(path, 'attachments')
+        written_peer = f'{path}:written'
+        own_file = os.path.join(path, f'{self.node}.jsonl')
+        if os.path.exists(own_file) and os.path.getsize(own_file) != self.get_peer_position(written_peer):
+            # A copy of this database wrote under the same node id
+            self.save_setting('sync_node', uuid.uuid4().hex)
+            own_file = os.path.join(path, f'{self.node}.jsonl')
+        pulled = 0
+        for name in sorted(os.listdir(path)):
+            node, extension = os.path.splitext(name)
+            if extension != '.jsonl' or node == self.node:
+                continue
+            peer = f'{path}:{node}'
+            with open(os.path.join(path, name), 'rb') as f:
+                f.seek(self.get_peer_position(peer))
+                data = f.read()
+            complete = data[:data.rfind(b'\n') + 1]
+            if complete:
+                pulled += self.apply_changes([json.loads(line) for line in complete.decode('utf-8').splitlines() if line])
+                self.set_peer_position(peer, self.get_peer_position(peer) + len(complete))
+        if os.path.isdir(attachments_dir):
+            self.attachments.copy_objects(attachments_dir, self.attachments.objects_dir)
+        export_peer = f'{path}:export'
+        changes, position = self.export_changes(self.get_peer_position(export_peer))
+        if changes:
+            with open(own_file, 'a', encoding='utf-8') as f:
+                for change in changes:
+                    f.write(json.dumps(change, ensure_ascii=False) + '\n')
+            self.attachments.copy_objects(self.attachments.objects_dir, attachments_dir)
+            self.set_peer_position(written_peer, os.path.getsize(own_file))
+        self.set_peer_position(export_peer, position)
+        return pulled, len(changes)
+
     def backup_database(self, path):
-        import shutil
         shutil.copyfile(self.db_path, path)
+        archive_backup = os.path.splitext(path)[0] + '_archive.db'
+        if not os.path.exists(archive_backup) or os.path.getmtime(archive_backup) < os.path.getmtime(self.archive_path):
+            shutil.copyfile(self.archive_path, archive_backup)
+        self.attachments.copy_objects(self.attachments.objects_dir, os.path.splitext(path)[0] + '_attachments')
 
     def restore_database(self, path):
-        import shutil
         self.conn.close()
         shutil.copyfile(path, self.db_path)
-        self.conn = sqlite3.connect(self.db_path)
+        archive_backup = os.path.splitext(path)[0] + '_archive.db'
+        if os.path.exists(archive_backup):
+            shutil.copyfile(archive_backup, self.archive_path)
+        self.connect()
+        self.create_tables()
+        attachments_backup = os.path.splitext(path)[0] + '_attachments'
+        if os.path.isdir(attachments_backup):
+            self.attachments.copy_objects(attachments_backup, self.attachments.objects_dir)
+
+class AttachmentStore:
+    def __init__(self, db, root):
+        self.db = db
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.thumbnails_dir = os.path.join(root, 'thumbnails')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.thumbnails_dir, exist_ok=True)
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def ingest(self, path, chunk_size=1024 * 1024):
+        hasher = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.objects_dir)
+        try:
+            with open(path, 'rb') as source, os.fdopen(fd, 'wb') as target:
+                for chunk in iter(lambda: source.read(chunk_size), b''):
+                    hasher.update(chunk)
+                    target.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            object_path = self.object_path(digest)
+            if os.path.exists(object_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                os.replace(temp_path, object_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.db.add_attachment(digest, os.path.basename(path), size)
+        return digest
+
+    def open_mapped(self, digest):
+        with open(self.object_path(digest), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b'')
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def export(self, digest, path, chunk_size=1024 * 1024):
+        data = self.open_mapped(digest)
+        try:
+            with open(path, 'wb') as target:
+                for offset in range(0, len(data), chunk_size):
+                    target.write(data[offset:offset + chunk_size])
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+        return path
+
+    def export_to_temp(self, digest):
+        attachment = self.db.get_attachment(digest)
+        directory = os.path.join(tempfile.gettempdir(), 'TaskManager', digest[:12])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, attachment[0] if attachment else digest)
+        if not os.path.exists(path):
+            self.export(digest, path)
+        return path
+
+    def thumbnail(self, digest, size=128):
+        path = os.path.join(self.thumbnails_dir, f'{digest}-{size}.png')
+        if os.path.exists(path):
+            return path
+        image = QImage(self.object_path(digest))
+        if image.isNull():
+            return None
+        image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation).save(path, 'PNG')
+        return path
+
+    def preview_text(self, digest, limit=2048):
+        data = self.open_mapped(digest)
+        try:
+            head = bytes(data[:limit])
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+        if b'\0' in head:
+            return None
+        return head.decode('utf-8', errors='replace')
+
+    def collect_garbage(self):
+        # Skip recent objects: a task dialog may have ingested a file it has not saved yet
+        digests = self.db.get_unreferenced_attachments((datetime.now() - ATTACHMENT_GRACE_PERIOD).isoformat())
+        unreferenced = set(digests)
+        paths = [self.object_path(digest) for digest in digests]
+        paths += [os.path.join(self.thumbnails_dir, name) for name in os.listdir(self.thumbnails_dir) if name.split('-')[0] in unreferenced]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        if digests:
+            self.db.delete_attachments(digests)
+        return len(digests)
+
+    def copy_objects(self, source_dir, target_dir):
+        copied = 0
+        for directory, _, names in os.walk(source_dir):
+            for name in names:
+                if len(name) != 64:
+                    continue
+                target = os.path.join(target_dir, name[:2], name)
+                if not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copyfile(os.path.join(directory, name), target)
+                    copied += 1
+        return copied
+
+class TaskExporter:
+    def __init__(self, db, progress=None, progress_interval=1000):
+        self.db = db
+        self.progress = progress
+        self.progress_interval = progress_interval
+
+    def export_tasks(self, path, fmt, **filters):
+        total = self.db.count_tasks(**filters)
+        with open(path + '.part', 'w', encoding='utf-8', newline='') as f:
+            if fmt == 'csv':
+                done = self.write_csv(f, TASK_DETAIL_COLUMNS, self.db.iter_tasks(**filters), total)
+            elif fmt == 'jsonl':
+                done = self.write_jsonl(f, TASK_DETAIL_COLUMNS, self.db.iter_tasks(**filters), total)
+            elif fmt == 'ics':
+                done = self.write_ics(f, filters, total)
+            else:
+                raise ValueError(f'Unsupported export format: {fmt}')
+        if done is None:
+            os.remove(path + '.part')
+        else:
+            os.replace(path + '.part', path)
+        return done
+
+    def export_history(self, path, fmt):
+        columns = ('date', 'completion_percentage', 'task_ids', 'total_tasks', 'completed_tasks')
+        with open(path + '.part', 'w', encoding='utf-8', newline='') as f:
+            if fmt == 'csv':
+                done = self.write_csv(f, columns, self.db.iter_history(), None)
+            elif fmt == 'jsonl':
+                done = self.write_jsonl(f, columns, self.db.iter_history(), None)
+            else:
+                raise ValueError(f'Unsupported history export format: {fmt}')
+        if done is None:
+            os.remove(path + '.part')
+        else:
+            os.replace(path + '.part', path)
+        return done
+
+    def report(self, done, total):
+        if self.progress and done % self.progress_interval == 0:
+            return self.progress(done, total) is not False
+        return True
+
+    def write_csv(self, f, columns, rows, total):
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        done = 0
+        for row in rows:
+            writer.writerow(row)
+            done += 1
+            if not self.report(done, total):
+                return None
+        return done
+
+    def write_jsonl(self, f, columns, rows, total):
+        done = 0
+        for row in rows:
+            f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n')
+            done += 1
+            if not self.report(done, total):
+                return None
+        return done
+
+    def write_ics(self, f, filters, total):
+        f.write('BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Task Manager//EN\r\n')
+        self.stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+        done = 0
+        for task in self.db.iter_tasks(is_recurring=False, **filters):
+            f.write(self.ics_event(task))
+            done += 1
+            if not self.report(done, total):
+                return None
+        for series in self.db.iter_recurring_series(**filters):
+            f.writelines(self.ics_series(series))
+            for _ in series:
+                done += 1
+                if not self.report(done, total):
+                    return None
+        f.write('END:VCALENDAR\r\n')
+        return done
+
+    # Describe the dates as stored: a rule on the smallest gap plus EXDATE/RDATE, or plain events when that is shorter
+    def ics_series(self, series):
+        dates = [Date.fromisoformat(task.date) for task in series]
+        if len(set(dates)) == len(dates) > 1:
+            step = min(later - earlier for earlier, later in zip(dates, dates[1:]))
+            grid = [dates[0] + step * index for index in range((dates[-1] - dates[0]) // step + 1)]
+            stored = set(dates)
+            exdates = [date for date in grid if date not in stored]
+            rdates = sorted(stored.difference(grid))
+            if len(exdates) + len(rdates) < len(dates) - 1:
+                return [self.ics_event(series[0], self.ics_rrule(step.days, series[-1].date), exdates, rdates)]
+        return [self.ics_event(task) for task in series]
+
+    def ics_rrule(self, days, until):
+        frequency = f'WEEKLY;INTERVAL={days // 7}' if days % 7 == 0 else f'DAILY;INTERVAL={days}'
+        return f"FREQ={frequency};UNTIL={until.replace('-', '')}"
+
+    def ics_event(self, task, rrule=None, exdates=(), rdates=()):
+        date = task.date.replace('-', '')
+        lines = [
+            'BEGIN:VEVENT',
+            f'UID:task-{task.id}@task-manager',
+            f'DTSTAMP:{self.stamp}',
+            f"DTSTART:{date}T{task.time.replace(':', '')}00" if task.time else f'DTSTART;VALUE=DATE:{date}',
+            f'SUMMARY:{self.ics_escape(task.title)}'
+        ]
+        if task.description:
+            lines.append(f'DESCRIPTION:{self.ics_escape(task.description)}')
+        if task.category:
+            lines.append(f'CATEGORIES:{self.ics_escape(task.category)}')
+        if task.priority in ICS_PRIORITIES:
+            lines.append(f'PRIORITY:{ICS_PRIORITIES[task.priority]}')
+        if task.notes:
+            lines.append(f'COMMENT:{self.ics_escape(task.notes)}')
+        lines.append(f'X-TASK-STATUS:{task.status}')
+        if rrule:
+            lines.append(f'RRULE:{rrule}')
+        for name, dates in (('EXDATE', exdates), ('RDATE', rdates)):
+            if dates:
+                lines.append(self.ics_dates(name, task.time, dates))
+        lines.append('END:VEVENT')
+        return ''.join(self.ics_fold(line) + '\r\n' for line in lines)
+
+    def ics_dates(self, name, time, dates):
+        if time:
+            return f"{name}:{','.join(date.strftime('%Y%m%d') + 'T' + time.replace(':', '') + '00' for date in dates)}"
+        return f"{name};VALUE=DATE:{','.join(date.strftime('%Y%m%d') for date in dates)}"
+
+    def ics_escape(self, text):
+        return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+    def ics_fold(self, line, limit=75):
+        if len(line.encode('utf-8')) <= limit:
+            return line
+        parts, current, size = [], '', 0
+        for char in line:
+            width = len(char.encode('utf-8'))
+            if size + width > limit:
+                parts.append(current)
+                current, size = ' ', 1
+            current += char
+            size += width
+        parts.append(current)
+        return '\r\n'.join(parts)
+
+class TaskImporter:
+    columns = ('title', 'description', 'date', 'time', 'priority', 'category', 'is_recurring', 'recurring_type',
+               'status', 'created_at', 'updated_at', 'notes', 'attachment_path')
+
+    def __init__(self, db, progress=None, batch_size=5000, max_errors=1000):
+        self.db = db
+        self.progress = progress
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.priority_codes = dict(code_labels(PRIORITIES))
+        self.recurrence_codes = dict(code_labels(RECURRENCE_TYPES))
+        self.status_codes = dict(code_labels(STATUSES))
+        self.category_keys = {name: key for key, _, _, name in db.get_categories() if name}
+
+    def import_file(self, path, fmt=None, dry_run=False):
+        fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+        parsers = {'csv': self.iter_csv, 'jsonl': self.iter_jsonl, 'ics': self.iter_ics}
+        if fmt not in parsers:
+            raise ValueError(f'Unsupported import format: {fmt}')
+        cursor = self.db.conn.cursor()
+        cursor.execute(f'CREATE TEMP TABLE IF NOT EXISTS import_staging ({", ".join(self.columns)})')
+        cursor.execute('DELETE FROM temp.import_staging')
+        rows = inserted = 0
+        errors = []
+        batch = []
+        self.dates = set()
+        cancelled = False
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                try:
+                    for line, record in parsers[fmt](f):
+                        try:
+                            if isinstance(record, Exception):
+                                raise record
+                            for row in self.validate(record):
+                                batch.append(row)
+                                rows += 1
+                        except (ValueError, TypeError, KeyError) as e:
+                            if len(errors) < self.max_errors:
+                                errors.append((line, str(e)))
+                        if len(batch) >= self.batch_size:
+                            inserted += self.flush(cursor, batch, dry_run)
+                            batch = []
+                            if self.progress and self.progress(rows) is False:
+                                raise ImportCancelled
+                    inserted += self.flush(cursor, batch, dry_run)
+                except ImportCancelled:
+                    if dry_run:
+                        self.db.conn.rollback()
+                        return None
+                    # Earlier batches are already committed, so keep them consistent and report them
+                    cancelled = True
+                if not dry_run:
+                    self.db.rebuild_history(self.dates)
+                    self.db.register_task_categories()
+                    self.db.conn.commit()
+        except BaseException:
+            self.db.conn.rollback()
+            raise
+        if dry_run:
+            self.db.conn.rollback()
+        return ImportReport(rows, inserted, rows - inserted, errors, cancelled)
+
+    def flush(self, cursor, batch, dry_run):
+        if not batch:
+            return 0
+        cursor.executemany(f'INSERT INTO temp.import_staging VALUES ({", ".join("?" * len(self.columns))})', batch)
+        cursor.execute(f'''
+            INSERT INTO tasks ({", ".join(self.columns)}, uid)
+            SELECT {", ".join(self.columns)}, lower(hex(randomblob(16))) FROM temp.import_staging s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM all_tasks t WHERE t.title = s.title AND t.date = s.date AND t.time = s.time
+            )
+            GROUP BY s.date, s.title, s.time
+        ''')
+        inserted = cursor.rowcount
+        self.dates.update(row[2] for row in batch)
+        cursor.execute('DELETE FROM temp.import_staging')
+        if not dry_run:
+            self.db.conn.commit()
+        return inserted
+
+    def validate(self, record):
+        title = self.text(record, 'title').strip()
+        if not title:
+            raise ValueError('title is required')
+        date = self.task_date(self.text(record, 'date').strip())
+        time = self.text(record, 'time').strip()
+        if time and not TIME_PATTERN.fullmatch(time):
+            raise ValueError(f'invalid time: {time}')
+        status = self.status_codes.get(str(self.scalar(record, 'status') or 'pending').strip())
+        if status is None:
+            raise ValueError(f"invalid status: {record.get('status')}")
+        priority = self.priority_codes.get(str(self.scalar(record, 'priority') or DEFAULT_PRIORITY).strip())
+        if priority is None:
+            raise ValueError(f"invalid priority: {record.get('priority')}")
+        is_recurring = str(self.scalar(record, 'is_recurring') or '').strip().lower() in ('1', 'true', 'yes')
+        recurring_type = self.recurrence_codes.get(str(self.scalar(record, 'recurring_type') or '').strip(), 'daily') if is_recurring else None
+        rrule = self.text(record, 'rrule')
+        interval, until = self.parse_rrule(rrule, date) if rrule else (None, None)
+        exdates = set(self.date_list(record, 'exdates'))
+        rdates = [self.task_date(extra) for extra in self.date_list(record, 'rdates')]
+        now = datetime.now().isoformat()
+        category = self.text(record, 'category').strip()
+        row = [title, self.text(record, 'description'), date, time, priority,
+               self.category_keys.get(category, category), is_recurring, recurring_type, status,
+               self.text(record, 'created_at') or now, now, self.text(record, 'notes'), '']
+        yield tuple(row)
+        row[8] = 'pending'
+        if interval:
+            current = Date.fromisoformat(date) + interval
+            while current <= until:
+                if current.isoformat() not in exdates:
+                    row[2] = current.isoformat()
+                    yield tuple(row)
+                current += interval
+        for extra in rdates:
+            row[2] = extra
+            yield tuple(row)
+
+    def text(self, record, field):
+        value = record.get(field)
+        if value is None:
+            return ''
+        if not isinstance(value, str):
+            raise ValueError(f'{field} must be text')
+        return value
+
+    def scalar(self, record, field):
+        value = record.get(field)
+        if value is not None and not isinstance(value, (str, int, float)):
+            raise ValueError(f'{field} must be text or a number')
+        return value
+
+    def date_list(self, record, field):
+        value = record.get(field) or []
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f'{field} must be a list of dates')
+        return value
+
+    def task_date(self, value):
+        if len(value) != 10:
+            raise ValueError(f'invalid date: {value}')
+        date = Date.fromisoformat(value)
+        if date.year not in TASK_YEARS:
+            raise ValueError(f'date out of range: {date}')
+        return date.isoformat()
+
+    def parse_rrule(self, rrule, start):
+        parts = dict(part.split('=', 1) for part in rrule.split(';') if '=' in part)
+        if parts.get('FREQ') not in ICS_FREQUENCIES:
+            raise ValueError(f'unsupported RRULE: {rrule}')
+        if int(parts.get('INTERVAL', '1')) < 1 or int(parts.get('COUNT', '1')) < 1:
+            raise ValueError(f'invalid RRULE: {rrule}')
+        interval = timedelta(days=ICS_FREQUENCIES[parts['FREQ']] * int(parts.get('INTERVAL', '1')))
+        until = Date.fromisoformat(pendulum.parse(start).add(years=9).to_date_string())
+        start = Date.fromisoformat(start)
+        if 'UNTIL' in parts:
+            until = min(until, datetime.strptime(parts['UNTIL'][:8], '%Y%m%d').date())
+        if 'COUNT' in parts:
+            until = min(until, start + interval * (int(parts['COUNT']) - 1))
+        return interval, until
+
+    def recurring_type(self, interval):
+        for name, delta in RECURRENCE_DELTAS.items():
+            if delta == interval:
+                return name
+        return 'daily'
+
+    def iter_csv(self, f):
+        reader = csv.DictReader(f)
+        for record in reader:
+            yield reader.line_num, record
+
+    def iter_jsonl(self, f):
+        for line, text in enumerate(f, 1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as e:
+                yield line, ValueError(f'invalid JSON: {e}')
+                continue
+            yield line, record if isinstance(record, dict) else ValueError('expected a JSON object')
+
+    def iter_ics(self, f):
+        event = None
+        for line, name, params, value in self.iter_ics_properties(f):
+            if name == 'BEGIN' and value == 'VEVENT':
+                event = {'line': line}
+            elif name == 'END' and value == 'VEVENT' and event is not None:
+                yield event.pop('line'), event
+                event = None
+            elif event is not None:
+                self.read_ics_property(event, name, params, value)
+
+    def iter_ics_properties(self, f):
+        pending, pending_line = None, 0
+        for line, text in enumerate(f, 1):
+            text = text.rstrip('\r\n')
+            if text[:1] in (' ', '\t') and pending is not None:
+                pending += text[1:]
+                continue
+            if pending:
+                yield self.split_ics_property(pending_line, pending)
+            pending, pending_line = text, line
+        if pending:
+            yield self.split_ics_property(pending_line, pending)
+
+    def split_ics_property(self, line, text):
+        head, _, value = text.partition(':')
+        name, *params = head.split(';')
+        return line, name.upper(), params, value
+
+    def read_ics_property(self, event, name, params, value):
+        text = re.sub(r'\\(.)', lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
+        if name == 'SUMMARY':
+            event['title'] = text
+        elif name == 'DESCRIPTION':
+            event['description'] = text
+        elif name == 'COMMENT':
+            event['notes'] = text
+        elif name == 'CATEGORIES':
+            event['category'] = text.split(',')[0]
+        elif name == 'PRIORITY' and value.isdigit() and int(value):
+            event['priority'] = 3 if int(value) < 5 else 2 if int(value) == 5 else 1
+        elif name == 'X-TASK-STATUS':
+            event['status'] = value
+        elif name == 'DTSTART':
+            event['date'] = f'{value[:4]}-{value[4:6]}-{value[6:8]}'
+            if 'T' in value:
+                event['time'] = f'{value[9:11]}:{value[11:13]}'
+        elif name in ('EXDATE', 'RDATE'):
+            event.setdefault(name.lower() + 's', []).extend(
+                f'{item[:4]}-{item[4:6]}-{item[6:8]}' for item in value.split(',') if item)
+        elif name == 'RRULE':
+            event['rrule'] = value
+            frequency = dict(part.split('=', 1) for part in value.split(';') if '=' in part)
+            if frequency.get('FREQ') in ICS_FREQUENCIES and frequency.get('INTERVAL', '1').isdigit():
+                event['is_recurring'] = True
+                event['recurring_type'] = self.recurring_type(
+                    timedelta(days=ICS_FREQUENCIES[frequency['FREQ']] * int(frequency.get('INTERVAL', '1'))))
+
+class CategoryRegistry(QObject):
+    changed = pyqtSignal()
+
+    def __init__(self, db, language, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.language = language
+        self.reload()
+
+    def reload(self):
+        self.colors = {}
+        self.names = {}
+        self.icons = {}
+        for key, color, language, name in self.db.get_categories():
+            self.colors.setdefault(key, color or CATEGORY_COLORS[len(self.colors) % len(CATEGORY_COLORS)])
+            if language:
+                self.names.setdefault(key, {})[language] = name
+        self.changed.emit()
+
+    def keys(self):
+        return list(self.colors)
+
+    def name(self, key):
+        return self.names.get(key, {}).get(self.language, key) if key else ''
+
+    def color(self, key):
+        return self.colors.get(key)
+
+    def icon(self, key):
+        if key not in self.icons:
+            pixmap = QPixmap(12, 12)
+            pixmap.fill(QColor(self.colors[key]))
+            self.icons[key] = QIcon(pixmap)
+        return self.icons[key]
+
+    def key_for(self, text):
+        text = text.strip()
+        if not text or text in self.colors:
+            return text
+        for key, names in self.names.items():
+            if text in names.values():
+                return key
+        self.db.add_category(text, CATEGORY_COLORS[len(self.colors) % len(CATEGORY_COLORS)], {self.language: text})
+        self.reload()
+        return text
+
+    def set_color(self, key, color):
+        self.db.set_category_color(key, color)
+        self.reload()
+
+    def populate(self, combo, *leading):
+        current = combo.currentData()
+        combo.blockSignals(True)
+        combo.clear()
+        for text, data in leading:
+            combo.addItem(text, data)
+        for key in self.colors:
+            combo.addItem(self.icon(key), self.name(key), key)
+        combo.setCurrentIndex(max(combo.findData(current), 0))
+        combo.blockSignals(False)
 
 class TaskDialog(QDialog):
     def __init__(self, parent=None, task=None):
         super().__init__(parent)
-        self.task = task
         self.db = parent.db
+        self.task = self.db.get_task(task.id) if task else None
         self.setWindowTitle(self.tr('Add Task') if not task else self.tr('Edit Task'))
         self.setMinimumWidth(500)
         self.init_ui()
@@ -207,13 +1667,13 @@ class TaskDialog(QDialog):
 
         # Title
         layout.addWidget(QLabel(self.tr('Title')), 0, 0)
-        self.title_edit = QLineEdit(self.task[1] if self.task else '')
+        self.title_edit = QLineEdit(self.task.title if self.task else '')
         self.title_edit.setPlaceholderText(self.tr('Enter task title'))
         layout.addWidget(self.title_edit, 0, 1, 1, 2)
 
         # Description
         layout.addWidget(QLabel(self.tr('Description')), 1, 0)
-        self.desc_edit = QTextEdit(self.task[2] if self.task else '')
+        self.desc_edit = QTextEdit(self.task.description if self.task else '')
         self.desc_edit.setPlaceholderText(self.tr('Enter task description'))
         self.desc_edit.setMinimumHeight(100)
         layout.addWidget(self.desc_edit, 1, 1, 1, 2)
@@ -221,8 +1681,9 @@ class TaskDialog(QDialog):
         # Date
         layout.addWidget(QLabel(self.tr('Date')), 2, 0)
         self.date_edit = QDateEdit()
+        self.date_edit.setCalendar(self.parent().qcalendar)
         self.date_edit.setCalendarPopup(True)
-        self.date_edit.setDate(QDate.fromString(self.task[3], 'yyyy-MM-dd') if self.task else QDate.currentDate())
+        self.date_edit.setDate(QDate.fromString(self.task.date, 'yyyy-MM-dd') if self.task else QDate.currentDate())
         self.date_edit.setMinimumDate(QDate.currentDate())
         self.date_edit.setMaximumDate(QDate.currentDate().addYears(9))
         layout.addWidget(self.date_edit, 2, 1)
@@ -231,67 +1692,123 @@ class TaskDialog(QDialog):
         layout.addWidget(QLabel(self.tr('Time')), 3, 0)
         self.time_edit = QTimeEdit()
         self.time_edit.setDisplayFormat('HH:mm')
-        if self.task and self.task[4]:
-            self.time_edit.setTime(QTime.fromString(self.task[4], 'HH:mm'))
+        if self.task and self.task.time:
+            self.time_edit.setTime(QTime.fromString(self.task.time, 'HH:mm'))
         layout.addWidget(self.time_edit, 3, 1)
 
         # Priority
         layout.addWidget(QLabel(self.tr('Priority')), 4, 0)
         self.priority_combo = QComboBox()
-        self.priority_combo.addItems([self.tr('Low'), self.tr('Medium'), self.tr('High')])
-        if self.task:
-            self.priority_combo.setCurrentText(self.task[5])
+        for code, name in sorted(PRIORITIES.items()):
+            self.priority_combo.addItem(self.tr(name), code)
+        self.priority_combo.setCurrentIndex(self.priority_combo.findData(self.task.priority if self.task else DEFAULT_PRIORITY))
         layout.addWidget(self.priority_combo, 4, 1)
 
         # Category
         layout.addWidget(QLabel(self.tr('Category')), 5, 0)
         self.category_combo = QComboBox()
-        self.category_combo.addItems([''] + self.db.get_categories())
+        self.parent().categories.populate(self.category_combo, ('', ''))
         self.category_combo.setEditable(True)
         if self.task:
-            self.category_combo.setCurrentText(self.task[6])
+            self.category_combo.setCurrentText(self.parent().categories.name(self.task.category))
         layout.addWidget(self.category_combo, 5, 1)
 
         # Notes
         layout.addWidget(QLabel(self.tr('Notes')), 6, 0)
-        self.notes_edit = QTextEdit(self.task[12] if self.task else '')
+        self.notes_edit = QTextEdit(self.task.notes if self.task else '')
         self.notes_edit.setPlaceholderText(self.tr('Additional notes'))
         layout.addWidget(self.notes_edit, 6, 1, 1, 2)
 
+        # Attachment
+        layout.addWidget(QLabel(self.tr('Attachment')), 7, 0)
+        attachment_layout = QHBoxLayout()
+        self.attachment_digest = self.task.attachment_path if self.task and self.task.attachment_path else ''
+        self.attachment_label = QLabel()
+        self.attachment_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
+        attachment_layout.addWidget(self.attachment_label)
+        self.attach_btn = QToolButton()
+        self.attach_btn.setText(self.tr('Attach'))
+        self.attach_btn.clicked.connect(self.attach_file)
+        attachment_layout.addWidget(self.attach_btn)
+        self.open_attachment_btn = QToolButton()
+        self.open_attachment_btn.setText(self.tr('Open'))
+        self.open_attachment_btn.clicked.connect(self.open_attachment)
+        attachment_layout.addWidget(self.open_attachment_btn)
+        self.remove_attachment_btn = QToolButton()
+        self.remove_attachment_btn.setText(self.tr('Remove'))
+        self.remove_attachment_btn.clicked.connect(lambda: self.set_attachment(''))
+        attachment_layout.addWidget(self.remove_attachment_btn)
+        layout.addLayout(attachment_layout, 7, 1, 1, 2)
+        self.attachment_preview = QLabel()
+        self.attachment_preview.setWordWrap(True)
+        layout.addWidget(self.attachment_preview, 8, 1, 1, 2)
+        self.set_attachment(self.attachment_digest)
+
         # Recurring
         self.recurring_check = QCheckBox(self.tr('Recurring Task'))
-        self.recurring_check.setChecked(self.task[7] if self.task else False)
-        layout.addWidget(self.recurring_check, 7, 0)
+        self.recurring_check.setChecked(bool(self.task.is_recurring) if self.task else False)
+        layout.addWidget(self.recurring_check, 9, 0)
         self.recurring_type = QComboBox()
-        self.recurring_type.addItems([self.tr('Daily'), self.tr('Weekly'), self.tr('Monthly'), self.tr('Yearly')])
+        for code, name in RECURRENCE_TYPES.items():
+            self.recurring_type.addItem(self.tr(name), code)
         self.recurring_type.setEnabled(self.recurring_check.isChecked())
-        if self.task:
-            self.recurring_type.setCurrentText(self.task[8])
-        layout.addWidget(self.recurring_type, 7, 1)
+        if self.task and self.task.recurring_type:
+            self.recurring_type.setCurrentIndex(self.recurring_type.findData(self.task.recurring_type))
+        layout.addWidget(self.recurring_type, 9, 1)
         self.recurring_check.stateChanged.connect(lambda: self.recurring_type.setEnabled(self.recurring_check.isChecked()))
 
         # Status (for editing)
         if self.task:
             self.complete_check = QCheckBox(self.tr('Completed'))
-            self.complete_check.setChecked(self.task[9] == 'completed')
-            layout.addWidget(self.complete_check, 8, 0)
+            self.complete_check.setChecked(self.task.status == 'completed')
+            layout.addWidget(self.complete_check, 10, 0)
             self.delete_all_check = QCheckBox(self.tr('Delete for all future dates (if recurring)'))
-            self.delete_all_check.setEnabled(self.task[7])
-            layout.addWidget(self.delete_all_check, 8, 1)
+            self.delete_all_check.setEnabled(bool(self.task.is_recurring))
+            layout.addWidget(self.delete_all_check, 10, 1)
 
         # Buttons
         self.save_btn = QPushButton(self.tr('Save'))
         self.save_btn.clicked.connect(self.save_task)
-        layout.addWidget(self.save_btn, 9, 0)
+        layout.addWidget(self.save_btn, 11, 0)
 
         if self.task:
             self.delete_btn = QPushButton(self.tr('Delete'))
             self.delete_btn.clicked.connect(self.delete_task)
-            layout.addWidget(self.delete_btn, 9, 1)
+            layout.addWidget(self.delete_btn, 11, 1)
 
         self.cancel_btn = QPushButton(self.tr('Cancel'))
         self.cancel_btn.clicked.connect(self.reject)
-        layout.addWidget(self.cancel_btn, 9, 2)
+        layout.addWidget(self.cancel_btn, 11, 2)
+
+    def set_attachment(self, digest):
+        self.attachment_digest = digest
+        attachment = self.db.get_attachment(digest) if digest else None
+        self.open_attachment_btn.setEnabled(attachment is not None)
+        self.remove_attachment_btn.setEnabled(bool(digest))
+        self.attachment_preview.clear()
+        if not attachment:
+            self.attachment_label.setText(self.tr('No attachment'))
+            self.attachment_preview.hide()
+            return
+        self.attachment_label.setText(f'{attachment[0]} ({attachment[1] / 1024:.1f} KB)')
+        thumbnail = self.db.attachments.thumbnail(digest)
+        if thumbnail:
+            self.attachment_preview.setPixmap(QPixmap(thumbnail))
+        else:
+            self.attachment_preview.setText(self.db.attachments.preview_text(digest, 300) or '')
+        self.attachment_preview.show()
+
+    def attach_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, self.tr('Attach'))
+        if path:
+            try:
+                self.set_attachment(self.db.attachments.ingest(path))
+            except OSError as e:
+                QMessageBox.critical(self, self.tr('Error'), str(e))
+
+    def open_attachment(self):
+        if self.attachment_digest:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(self.db.attachments.export_to_temp(self.attachment_digest)))
 
     def save_task(self):
         title = self.title_edit.text().strip()
@@ -301,17 +1818,17 @@ class TaskDialog(QDialog):
         description = self.desc_edit.toPlainText()
         date = self.date_edit.date().toString('yyyy-MM-dd')
         time = self.time_edit.time().toString('HH:mm') if self.time_edit.time().isValid() else ''
-        priority = self.priority_combo.currentText()
-        category = self.category_combo.currentText()
+        priority = self.priority_combo.currentData()
+        category = self.parent().categories.key_for(self.category_combo.currentText())
         notes = self.notes_edit.toPlainText()
         is_recurring = self.recurring_check.isChecked()
-        recurring_type = self.recurring_type.currentText() if is_recurring else ''
-        attachment_path = ''
+        recurring_type = self.recurring_type.currentData() if is_recurring else None
+        attachment_path = self.attachment_digest
 
         if self.task:
-            self.db.update_task(self.task[0], title, description, time, priority, category, notes, attachment_path)
+            self.db.update_task(self.task.id, title, description, time, priority, category, notes, attachment_path)
             if self.complete_check.isChecked():
-                self.db.update_task_status(self.task[0], 'completed')
+                self.db.update_task_status(self.task.id, 'completed')
                 messages = {
                     'fa': ['آفرین! تو عالی هستی!', 'یک قدم دیگه به هدفت نزدیک شدی!', 'فوق‌العاده بود، ادامه بده!'],
                     'en': ['Great job! You’re awesome!', 'One step closer to your goal!', 'Keep it up, you’re amazing!'],
@@ -319,7 +1836,7 @@ class TaskDialog(QDialog):
                 }
                 QMessageBox.information(self, self.tr('Success'), random.choice(messages[self.parent().language]))
             if self.delete_all_check.isChecked():
-                self.db.delete_task(self.task[0], True)
+                self.db.delete_task(self.task.id, True)
         else:
             self.db.add_task(title, description, date, time, priority, category, is_recurring, recurring_type, notes, attachment_path)
         self.parent().update_task_list()
@@ -327,7 +1844,7 @@ class TaskDialog(QDialog):
 
     def delete_task(self):
         if self.task:
-            self.db.delete_task(self.task[0], self.delete_all_check.isChecked())
+            self.db.delete_task(self.task.id, self.delete_all_check.isChecked())
             self.parent().update_task_list()
             self.accept()
 
@@ -342,15 +1859,24 @@ class TaskItemWidget(QWidget):
         layout = QHBoxLayout(self)
         layout.setContentsMargins(5, 5, 5, 5)
         self.checkbox = QCheckBox()
-        self.checkbox.setChecked(self.task[9] == 'completed')
+        self.checkbox.setChecked(self.task.status == 'completed')
         self.checkbox.stateChanged.connect(self.toggle_task_status)
         layout.addWidget(self.checkbox)
 
-        task_info = f"{self.task[1]} ({self.task[4] or '-'}) - {self.task[5]}"
+        task_info = f"{self.task.title} ({self.task.time or '-'}) - {self.tr(PRIORITIES.get(self.task.priority, ''))}"
+        if self.task.attachment_path:
+            task_info += ' \U0001F4CE'
         self.label = QLabel(task_info)
         self.label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
         layout.addWidget(self.label)
 
+        if self.task.category:
+            categories = self.parent.categories
+            self.category_label = QLabel(categories.name(self.task.category))
+            self.category_label.setStyleSheet(
+                f'background-color: {categories.color(self.task.category) or "transparent"}; color: black; border-radius: 4px; padding: 1px 6px;')
+            layout.addWidget(self.category_label)
+
         self.edit_btn = QToolButton()
         self.edit_btn.setIcon(QIcon('edit.svg'))
         self.edit_btn.clicked.connect(self.edit_task)
@@ -360,7 +1886,7 @@ class TaskItemWidget(QWidget):
 
     def toggle_task_status(self):
         status = 'completed' if self.checkbox.isChecked() else 'pending'
-        self.parent.db.update_task_status(self.task[0], status)
+        self.parent.db.update_task_status(self.task.id, status)
         if status == 'completed':
             messages = {
                 'fa': ['آفرین! تو عالی هستی!', 'یک قدم دیگه به هدفت نزدیک شدی!', 'فوق‌العاده بود، ادامه بده!'],
@@ -374,6 +1900,601 @@ class TaskItemWidget(QWidget):
         dialog = TaskDialog(self.parent, self.task)
         dialog.exec()
 
+class ExportDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.db = parent.db
+        self.setWindowTitle(self.tr('Export Data'))
+        self.setMinimumWidth(400)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QGridLayout(self)
+        layout.setSpacing(10)
+
+        layout.addWidget(QLabel(self.tr('Data')), 0, 0)
+        self.data_combo = QComboBox()
+        self.data_combo.addItem(self.tr('Tasks'), 'tasks')
+        self.data_combo.addItem(self.tr('History'), 'history')
+        layout.addWidget(self.data_combo, 0, 1, 1, 2)
+
+        layout.addWidget(QLabel(self.tr('Format')), 1, 0)
+        self.format_combo = QComboBox()
+        self.format_combo.addItem('CSV', 'csv')
+        self.format_combo.addItem('JSON Lines', 'jsonl')
+        self.format_combo.addItem('iCalendar', 'ics')
+        layout.addWidget(self.format_combo, 1, 1, 1, 2)
+
+        self.date_check = QCheckBox(self.tr('Date range'))
+        layout.addWidget(self.date_check, 2, 0)
+        self.start_edit = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.start_edit.setCalendar(self.parent().qcalendar)
+        self.start_edit.setCalendarPopup(True)
+        layout.addWidget(self.start_edit, 2, 1)
+        self.end_edit = QDateEdit(QDate.currentDate())
+        self.end_edit.setCalendar(self.parent().qcalendar)
+        self.end_edit.setCalendarPopup(True)
+        layout.addWidget(self.end_edit, 2, 2)
+
+        layout.addWidget(QLabel(self.tr('Category')), 3, 0)
+        self.category_combo = QComboBox()
+        self.parent().categories.populate(self.category_combo, (self.tr('All'), None))
+        layout.addWidget(self.category_combo, 3, 1, 1, 2)
+
+        layout.addWidget(QLabel(self.tr('Status')), 4, 0)
+        self.status_combo = QComboBox()
+        self.status_combo.addItem(self.tr('All'), None)
+        self.status_combo.addItem(self.tr('Pending'), 'pending')
+        self.status_combo.addItem(self.tr('Completed'), 'completed')
+        layout.addWidget(self.status_combo, 4, 1, 1, 2)
+
+        self.data_combo.currentIndexChanged.connect(self.update_filters)
+        self.date_check.stateChanged.connect(self.update_filters)
+        self.update_filters()
+
+        self.export_btn = QPushButton(self.tr('Export'))
+        self.export_btn.clicked.connect(self.export)
+        layout.addWidget(self.export_btn, 5, 0)
+        self.cancel_btn = QPushButton(self.tr('Cancel'))
+        self.cancel_btn.clicked.connect(self.reject)
+        layout.addWidget(self.cancel_btn, 5, 2)
+
+    def update_filters(self):
+        tasks = self.data_combo.currentData() == 'tasks'
+        self.date_check.setEnabled(tasks)
+        self.start_edit.setEnabled(tasks and self.date_check.isChecked())
+        self.end_edit.setEnabled(tasks and self.date_check.isChecked())
+        self.category_combo.setEnabled(tasks)
+        self.status_combo.setEnabled(tasks)
+        self.format_combo.model().item(2).setEnabled(tasks)
+        if not tasks and self.format_combo.currentData() == 'ics':
+            self.format_combo.setCurrentIndex(0)
+
+    def export(self):
+        fmt = self.format_combo.currentData()
+        path, _ = QFileDialog.getSaveFileName(self, self.tr('Export Data'), f'tasks.{fmt}', f'*.{fmt}')
+        if not path:
+            return
+        progress = QProgressDialog(self.tr('Exporting...'), self.tr('Cancel'), 0, 0, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def report(done, total):
+            if total:
+                progress.setMaximum(total)
+                progress.setValue(done)
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+
+        exporter = TaskExporter(self.db, report)
+        try:
+            if self.data_combo.currentData() == 'history':
+                count = exporter.export_history(path, fmt)
+            else:
+                count = exporter.export_tasks(
+                    path, fmt,
+                    start=self.start_edit.date().toString('yyyy-MM-dd') if self.date_check.isChecked() else None,
+                    end=self.end_edit.date().toString('yyyy-MM-dd') if self.date_check.isChecked() else None,
+                    category=self.category_combo.currentData(),
+                    status=self.status_combo.currentData()
+                )
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, self.tr('Error'), str(e))
+            return
+        finally:
+            progress.close()
+        if count is not None:
+            QMessageBox.information(self, self.tr('Success'), f"{self.tr('Exported rows')}: {count}")
+            self.accept()
+
+class CompletionHeatmap(QWidget):
+    dateClicked = pyqtSignal(QDate)
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.cell = 12
+        self.gap = 2
+        self.top = 16
+        self.year = QDate.currentDate().year()
+        self.jalali = None
+        self.calendar_system = QCalendar()
+        self.cache = {}
+        self.setMouseTracking(True)
+        self.setFixedSize(self.sizeHint())
+
+    def sizeHint(self):
+        return QSize(54 * (self.cell + self.gap), self.top + 7 * (self.cell + self.gap))
+
+    def set_year(self, year):
+        self.year = year
+        self.update()
+
+    def clear_cache(self):
+        self.cache.clear()
+        self.update()
+
+    def set_calendar(self, jalali, calendar_system):
+        if (jalali is None) != (self.jalali is None):
+            self.year = jalali.to_jalali(Date.today())[0] if jalali else Date.today().year
+        self.jalali = jalali
+        self.calendar_system = calendar_system
+        self.clear_cache()
+
+    def year_bounds(self, year):
+        if self.jalali:
+            first, last = self.jalali.year_range(year)
+            return QDate(first.year, first.month, first.day), (last - first).days + 1
+        return QDate(year, 1, 1), QDate(year, 1, 1).daysInYear()
+
+    def locate(self, date):
+        year = self.jalali.to_jalali(Date(date.year(), date.month(), date.day()))[0] if self.jalali else date.year()
+        return year, self.year_bounds(year)[0].daysTo(date)
+
+    def year_data(self, year):
+        if year not in self.cache:
+            totals = array('H', bytes(2 * 366))
+            completed = array('H', bytes(2 * 366))
+            first, days = self.year_bounds(year)
+            for date, total, done in self.db.get_daily_completion(first.toString('yyyy-MM-dd'), first.addDays(days - 1).toString('yyyy-MM-dd')):
+                index = first.daysTo(QDate.fromString(date, 'yyyy-MM-dd'))
+                totals[index] = min(total, 65535)
+                completed[index] = min(done or 0, 65535)
+            pixmap = QPixmap(self.sizeHint())
+            pixmap.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(pixmap)
+            painter.setPen(self.palette().color(QPalette.ColorRole.WindowText))
+            for month in range(1, 13):
+                start = self.jalali.month_range(year, month)[0] if self.jalali else Date(year, month, 1)
+                column, _ = self.cell_position(first.daysTo(QDate(start.year, start.month, start.day)), year)
+                painter.drawText(column * (self.cell + self.gap), self.top - 4,
+                                 self.calendar_system.monthName(QLocale(), month, year, QLocale.FormatType.NarrowFormat))
+            for index in range(days):
+                self.paint_cell(painter, index, year, totals[index], completed[index])
+            painter.end()
+            self.cache[year] = (totals, completed, pixmap)
+            while len(self.cache) > 5:
+                self.cache.pop(next(key for key in self.cache if key != self.year))
+        return self.cache[year]
+
+    def invalidate_dates(self, dates):
+        if len(dates) > 31:
+            self.clear_cache()
+            return
+        for date in dates:
+            date = QDate.fromString(date, 'yyyy-MM-dd')
+            year, index = self.locate(date)
+            if year not in self.cache:
+                continue
+            totals, completed, pixmap = self.cache[year]
+            rows = self.db.get_daily_completion(date.toString('yyyy-MM-dd'), date.toString('yyyy-MM-dd'))
+            totals[index], completed[index] = (rows[0][1], rows[0][2] or 0) if rows else (0, 0)
+            painter = QPainter(pixmap)
+            self.paint_cell(painter, index, year, totals[index], completed[index])
+            painter.end()
+        self.update()
+
+    def cell_position(self, index, year):
+        offset = self.year_bounds(year)[0].dayOfWeek() - 1
+        return divmod(index + offset, 7)
+
+    def cell_rect(self, index, year):
+        column, row = self.cell_position(index, year)
+        return QRect(column * (self.cell + self.gap), self.top + row * (self.cell + self.gap), self.cell, self.cell)
+
+    def cell_color(self, total, completed):
+        if not total:
+            return QColor(200, 200, 200, 80)
+        ratio = completed / total
+        return QColor(int(235 - 202 * ratio), int(237 - 127 * ratio), int(240 - 183 * ratio))
+
+    def paint_cell(self, painter, index, year, total, completed):
+        painter.fillRect(self.cell_rect(index, year), self.cell_color(total, completed))
+
+    def index_at(self, pos):
+        column = pos.x() // (self.cell + self.gap)
+        row = (pos.y() - self.top) // (self.cell + self.gap)
+        if pos.y() < self.top or not 0 <= row < 7:
+            return None
+        first, days = self.year_bounds(self.year)
+        index = column * 7 + row - (first.dayOfWeek() - 1)
+        return index if 0 <= index < days else None
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.year_data(self.year)[2])
+
+    def mouseMoveEvent(self, event):
+        index = self.index_at(event.position().toPoint())
+        if index is None:
+            QToolTip.hideText()
+            return
+        totals, completed, _ = self.year_data(self.year)
+        date = self.year_bounds(self.year)[0].addDays(index)
+        if self.jalali:
+            text = self.jalali.format(Date(date.year(), date.month(), date.day()))
+        else:
+            text = QLocale().toString(date, QLocale.FormatType.ShortFormat)
+        QToolTip.showText(event.globalPosition().toPoint(), f'{text}: {completed[index]} / {totals[index]}', self)
+
+    def mousePressEvent(self, event):
+        index = self.index_at(event.position().toPoint())
+        if index is not None:
+            self.dateClicked.emit(self.year_bounds(self.year)[0].addDays(index))
+
+
+TRANSLATIONS = {
+    'fa': {
+        'Task Manager': 'مدیریت وظایف',
+        'Tasks': 'وظایف',
+        'History': 'تاریخچه',
+        'Settings': 'تنظیمات',
+        'Add Task': 'افزودن وظیفه',
+        'Edit Task': 'ویرایش وظیفه',
+        'Title': 'عنوان',
+        'Description': 'توضیحات',
+        'Date': 'تاریخ',
+        'Time': 'زمان',
+        'Priority': 'اولویت',
+        'Low': 'کم',
+        'Medium': 'متوسط',
+        'High': 'بالا',
+        'Category': 'دسته‌بندی',
+        'Notes': 'یادداشت‌ها',
+        'Recurring Task': 'وظیفه تکراری',
+        'Daily': 'روزانه',
+        'Weekly': 'هفتگی',
+        'Monthly': 'ماهانه',
+        'Yearly': 'سالانه',
+        'Completed': 'تکمیل شده',
+        'Delete for all future dates (if recurring)': 'حذف برای تمام تاریخ‌های آینده (در صورت تکراری بودن)',
+        'Save': 'ذخیره',
+        'Delete': 'حذف',
+        'Cancel': 'لغو',
+        'Error': 'خطا',
+        'Title is required!': 'عنوان ضروری است!',
+        'Success': 'موفقیت',
+        'Search tasks...': 'جستجوی وظایف...',
+        'Refresh': 'تازه‌سازی',
+        '%p% Completed': '%p% تکمیل شده',
+        'No tasks for this date': 'هیچ وظیفه‌ای برای این تاریخ وجود ندارد',
+        'Completion: {percentage:.1f}% ({completed} of {total} tasks)': 'تکمیل: {percentage:.1f}% ({completed} از {total} وظیفه)',
+        'Task Reminder': 'یادآور وظیفه',
+        'Task': 'وظیفه',
+        'is overdue!': 'از موعد گذشته است!',
+        'Plan Tomorrow': 'برنامه‌ریزی برای فردا',
+        'You haven’t planned tasks for tomorrow!': 'شما وظایفی برای فردا برنامه‌ریزی نکرده‌اید!',
+        'Show': 'نمایش',
+        'Quit': 'خروج',
+        'Pending Tasks': 'وظایف در انتظار',
+        'You have pending tasks:': 'شما وظایف در انتظاری دارید:',
+        'Language': 'زبان',
+        'Persian': 'فارسی',
+        'English': 'انگلیسی',
+        'Chinese': 'چینی',
+        'Theme': 'تم',
+        'System': 'سیستم',
+        'Light': 'روشن',
+        'Dark': 'تیره',
+        'Enable Notifications': 'فعال کردن اعلان‌ها',
+        'Backup Database': 'پشتیبان‌گیری از پایگاه داده',
+        'Restore Database': 'بازگرداندن پایگاه داده',
+        'Enter backup file path:': 'مسیر فایل پشتیبان را وارد کنید:',
+        'Database backed up successfully!': 'پایگاه داده با موفقیت پشتیبان‌گیری شد!',
+        'Failed to backup database: {error}': 'پشتیبان‌گیری از پایگاه داده ناموفق بود: {error}',
+        'Enter task title': 'عنوان وظیفه را وارد کنید',
+        'Enter task description': 'توضیحات وظیفه را وارد کنید',
+        'Additional notes': 'یادداشت‌های اضافی',
+        'Work': 'کار',
+        'Personal': 'شخصی',
+        'Study': 'مطالعه',
+        'Exercise': 'ورزش',
+        'Other': 'سایر',
+        'Archive tasks older than (days)': 'بایگانی وظایف قدیمی‌تر از (روز)',
+        'Run Maintenance': 'اجرای نگهداری',
+        'Never': 'هرگز',
+        'tasks archived': 'وظیفه بایگانی شد',
+        'reclaimed': 'آزاد شد',
+        'Attachment': 'پیوست',
+        'Attach': 'پیوست کردن',
+        'Open': 'باز کردن',
+        'Remove': 'حذف پیوست',
+        'No attachment': 'بدون پیوست',
+        'Complete Selected': 'تکمیل انتخاب‌شده‌ها',
+        'Reopen Selected': 'بازگشایی انتخاب‌شده‌ها',
+        'Delete Selected': 'حذف انتخاب‌شده‌ها',
+        'Reschedule': 'تغییر تاریخ',
+        'Set Category': 'تعیین دسته‌بندی',
+        'Delete selected tasks?': 'وظایف انتخاب‌شده حذف شوند؟',
+        'Export Data': 'خروجی گرفتن از داده‌ها',
+        'Import Data': 'وارد کردن داده‌ها',
+        'Importing...': 'در حال وارد کردن...',
+        'New tasks': 'وظایف جدید',
+        'Duplicates': 'تکراری',
+        'Errors': 'خطاها',
+        'Agenda': 'دستور کار',
+        'Next 7 days': '۷ روز آینده',
+        'Next 30 days': '۳۰ روز آینده',
+        'Next 90 days': '۹۰ روز آینده',
+        'Overdue': 'سررسید گذشته',
+        'Off': 'خاموش',
+        'Move to today': 'انتقال به امروز',
+        'Copy to today': 'کپی به امروز',
+        'Unfinished tasks from previous days': 'وظایف ناتمام روزهای قبل',
+        'Rule for category': 'قانون برای دسته‌بندی',
+        'Default': 'پیش‌فرض',
+        'Sync': 'همگام‌سازی',
+        'Enter peer database or folder path:': 'مسیر پایگاه داده یا پوشه همتا را وارد کنید:',
+        'Received': 'دریافت‌شده',
+        'Sent': 'ارسال‌شده',
+        'All': 'همه',
+        'Status': 'وضعیت',
+        'Pending': 'در انتظار',
+        'Sort by time': 'مرتب‌سازی بر اساس زمان',
+        'Sort by priority': 'مرتب‌سازی بر اساس اولویت',
+        'Color': 'رنگ',
+        'Calendar': 'تقویم',
+        'Gregorian': 'میلادی',
+        'Jalali': 'شمسی',
+        'Import cancelled': 'وارد کردن لغو شد',
+        'Compact Database': 'فشرده‌سازی پایگاه داده',
+        'One-time conversion so idle maintenance can reclaim free space': 'تبدیل یک‌باره تا نگهداری در زمان بیکاری بتواند فضای آزاد را بازپس گیرد'
+    },
+    'en': {
+        'Task Manager': 'Task Manager',
+        'Tasks': 'Tasks',
+        'History': 'History',
+        'Settings': 'Settings',
+        'Add Task': 'Add Task',
+        'Edit Task': 'Edit Task',
+        'Title': 'Title',
+        'Description': 'Description',
+        'Date': 'Date',
+        'Time': 'Time',
+        'Priority': 'Priority',
+        'Low': 'Low',
+        'Medium': 'Medium',
+        'High': 'High',
+        'Category': 'Category',
+        'Notes': 'Notes',
+        'Recurring Task': 'Recurring Task',
+        'Daily': 'Daily',
+        'Weekly': 'Weekly',
+        'Monthly': 'Monthly',
+        'Yearly': 'Yearly',
+        'Completed': 'Completed',
+        'Delete for all future dates (if recurring)': 'Delete for all future dates (if recurring)',
+        'Save': 'Save',
+        'Delete': 'Delete',
+        'Cancel': 'Cancel',
+        'Error': 'Error',
+        'Title is required!': 'Title is required!',
+        'Success': 'Success',
+        'Search tasks...': 'Search tasks...',
+        'Refresh': 'Refresh',
+        '%p% Completed': '%p% Completed',
+        'No tasks for this date': 'No tasks for this date',
+        'Completion: {percentage:.1f}% ({completed} of {total} tasks)': 'Completion: {percentage:.1f}% ({completed} of {total} tasks)',
+        'Task Reminder': 'Task Reminder',
+        'Task': 'Task',
+        'is overdue!': 'is overdue!',
+        'Plan Tomorrow': 'Plan Tomorrow',
+        'You haven’t planned tasks for tomorrow!': 'You haven’t planned tasks for tomorrow!',
+        'Show': 'Show',
+        'Quit': 'Quit',
+        'Pending Tasks': 'Pending Tasks',
+        'You have pending tasks:': 'You have pending tasks:',
+        'Language': 'Language',
+        'Persian': 'Persian',
+        'English': 'English',
+        'Chinese': 'Chinese',
+        'Theme': 'Theme',
+        'System': 'System',
+        'Light': 'Light',
+        'Dark': 'Dark',
+        'Enable Notifications': 'Enable Notifications',
+        'Backup Database': 'Backup Database',
+        'Restore Database': 'Restore Database',
+        'Enter backup file path:': 'Enter backup file path:',
+        'Database backed up successfully!': 'Database backed up successfully!',
+        'Failed to backup database: {error}': 'Failed to backup database: {error}',
+        'Enter task title': 'Enter task title',
+        'Enter task description': 'Enter task description',
+        'Additional notes': 'Additional notes',
+        'Work': 'Work',
+        'Personal': 'Personal',
+        'Study': 'Study',
+        'Exercise': 'Exercise',
+        'Other': 'Other',
+        'Archive tasks older than (days)': 'Archive tasks older than (days)',
+        'Run Maintenance': 'Run Maintenance',
+        'Never': 'Never',
+        'tasks archived': 'tasks archived',
+        'reclaimed': 'reclaimed',
+        'Attachment': 'Attachment',
+        'Attach': 'Attach',
+        'Open': 'Open',
+        'Remove': 'Remove',
+        'No attachment': 'No attachment',
+        'Complete Selected': 'Complete Selected',
+        'Reopen Selected': 'Reopen Selected',
+        'Delete Selected': 'Delete Selected',
+        'Reschedule': 'Reschedule',
+        'Set Category': 'Set Category',
+        'Delete selected tasks?': 'Delete selected tasks?',
+        'Export Data': 'Export Data',
+        'Import Data': 'Import Data',
+        'Importing...': 'Importing...',
+        'New tasks': 'New tasks',
+        'Duplicates': 'Duplicates',
+        'Errors': 'Errors',
+        'Agenda': 'Agenda',
+        'Next 7 days': 'Next 7 days',
+        'Next 30 days': 'Next 30 days',
+        'Next 90 days': 'Next 90 days',
+        'Overdue': 'Overdue',
+        'Off': 'Off',
+        'Move to today': 'Move to today',
+        'Copy to today': 'Copy to today',
+        'Unfinished tasks from previous days': 'Unfinished tasks from previous days',
+        'Rule for category': 'Rule for category',
+        'Default': 'Default',
+        'Sync': 'Sync',
+        'Enter peer database or folder path:': 'Enter peer database or folder path:',
+        'Received': 'Received',
+        'Sent': 'Sent',
+        'All': 'All',
+        'Status': 'Status',
+        'Pending': 'Pending',
+        'Sort by time': 'Sort by time',
+        'Sort by priority': 'Sort by priority',
+        'Color': 'Color',
+        'Calendar': 'Calendar',
+        'Gregorian': 'Gregorian',
+        'Jalali': 'Jalali',
+        'Import cancelled': 'Import cancelled',
+        'Compact Database': 'Compact Database',
+        'One-time conversion so idle maintenance can reclaim free space': 'One-time conversion so idle maintenance can reclaim free space'
+    },
+    'zh': {
+        'Task Manager': '任务管理器',
+        'Tasks': '任务',
+        'History': '历史记录',
+        'Settings': '设置',
+        'Add Task': '添加任务',
+        'Edit Task': '编辑任务',
+        'Title': '标题',
+        'Description': '描述',
+        'Date': '日期',
+        'Time': '时间',
+        'Priority': '优先级',
+        'Low': '低',
+        'Medium': '中',
+        'High': '高',
+        'Category': '类别',
+        'Notes': '备注',
+        'Recurring Task': '重复任务',
+        'Daily': '每天',
+        'Weekly': '每周',
+        'Monthly': '每月',
+        'Yearly': '每年',
+        'Completed': '已完成',
+        'Delete for all future dates (if recurring)': '删除所有未来日期（如果重复）',
+        'Save': '保存',
+        'Delete': '删除',
+        'Cancel': '取消',
+        'Error': '错误',
+        'Title is required!': '标题是必填项！',
+        'Success': '成功',
+        'Search tasks...': '搜索任务...',
+        'Refresh': '刷新',
+        '%p% Completed': '%p% 已完成',
+        'No tasks for this date': '此日期没有任务',
+        'Completion: {percentage:.1f}% ({completed} of {total} tasks)': '完成度：{percentage:.1f}%（{completed}/{total} 任务）',
+        'Task Reminder': '任务提醒',
+        'Task': '任务',
+        'is overdue!': '已逾期！',
+        'Plan Tomorrow': '计划明天',
+        'You haven’t planned tasks for tomorrow!': '你还没有为明天计划任务！',
+        'Show': '显示',
+        'Quit': '退出',
+        'Pending Tasks': '待完成任务',
+        'You have pending tasks:': '你有待完成的任务：',
+        'Language': '语言',
+        'Persian': '波斯语',
+        'English': '英语',
+        'Chinese': '中文',
+        'Theme': '主题',
+        'System': '系统',
+        'Light': '明亮',
+        'Dark': '暗色',
+        'Enable Notifications': '启用通知',
+        'Backup Database': '备份数据库',
+        'Restore Database': '恢复数据库',
+        'Enter backup file path:': '输入备份文件路径：',
+        'Database backed up successfully!': '数据库备份成功！',
+        'Failed to backup database: {error}': '数据库备份失败：{error}',
+        'Enter task title': '输入任务标题',
+        'Enter task description': '输入任务描述',
+        'Additional notes': '附加备注',
+        'Work': '工作',
+        'Personal': '个人',
+        'Study': '学习',
+        'Exercise': '锻炼',
+        'Other': '其他',
+        'Archive tasks older than (days)': '归档早于以下天数的任务',
+        'Run Maintenance': '运行维护',
+        'Never': '从未',
+        'tasks archived': '个任务已归档',
+        'reclaimed': '已回收',
+        'Attachment': '附件',
+        'Attach': '添加附件',
+        'Open': '打开',
+        'Remove': '移除',
+        'No attachment': '无附件',
+        'Complete Selected': '完成所选',
+        'Reopen Selected': '重新打开所选',
+        'Delete Selected': '删除所选',
+        'Reschedule': '重新安排',
+        'Set Category': '设置类别',
+        'Delete selected tasks?': '删除所选任务？',
+        'Export Data': '导出数据',
+        'Import Data': '导入数据',
+        'Importing...': '正在导入...',
+        'New tasks': '新任务',
+        'Duplicates': '重复项',
+        'Errors': '错误',
+        'Agenda': '日程',
+        'Next 7 days': '未来 7 天',
+        'Next 30 days': '未来 30 天',
+        'Next 90 days': '未来 90 天',
+        'Overdue': '已逾期',
+        'Off': '关闭',
+        'Move to today': '移至今天',
+        'Copy to today': '复制到今天',
+        'Unfinished tasks from previous days': '之前未完成的任务',
+        'Rule for category': '类别规则',
+        'Default': '默认',
+        'Sync': '同步',
+        'Enter peer database or folder path:': '输入对端数据库或文件夹路径：',
+        'Received': '已接收',
+        'Sent': '已发送',
+        'All': '全部',
+        'Status': '状态',
+        'Pending': '待办',
+        'Sort by time': '按时间排序',
+        'Sort by priority': '按优先级排序',
+        'Color': '颜色',
+        'Calendar': '日历',
+        'Gregorian': '公历',
+        'Jalali': '波斯历',
+        'Import cancelled': '导入已取消',
+        'Compact Database': '压缩数据库',
+        'One-time conversion so idle maintenance can reclaim free space': '一次性转换，使空闲维护能够回收可用空间'
+    }
+}
+
+
 class TaskManager(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -381,11 +2502,20 @@ class TaskManager(QMainWindow):
         self.translator = QTranslator()
         self.language = self.db.get_setting('language', 'fa')
         self.theme = self.db.get_setting('theme', 'system')
+        self.categories = CategoryRegistry(self.db, self.language, self)
+        first_date = self.db.get_first_date()
+        this_year = datetime.now().year
+        first_year = max(min(int(first_date[:4]), this_year), this_year - JALALI_TABLE_YEARS) if first_date else this_year
+        self.jalali = JalaliCalendar(first_year, this_year + 9)
+        self.calendar_system = self.db.get_setting('calendar_system', 'jalali' if self.language == 'fa' else 'gregorian')
         self.set_language()
         self.init_ui()
+        self.categories.changed.connect(self.update_category_combos)
+        self.categories.changed.connect(self.refresh_task_view)
         self.setup_timers()
         self.setup_system_tray()
-        self.load_default_categories()
+        self.setup_instance_server()
+        self.check_rollover()
 
     def set_language(self):
         if self.language == 'fa':
@@ -476,17 +2606,6 @@ class TaskManager(QMainWindow):
                 '''
                 self.setStyleSheet(light_style)
 
-    def load_default_categories(self):
-        default_categories = [
-            (self.tr('Work'), '#FF6B6B'),
-            (self.tr('Personal'), '#4ECDC4'),
-            (self.tr('Study'), '#45B7D1'),
-            (self.tr('Exercise'), '#96CEB4'),
-            (self.tr('Other'), '#FFEEAD')
-        ]
-        for name, color in default_categories:
-            self.db.add_category(name, color)
-
     def init_ui(self):
         self.setWindowTitle(self.tr('Task Manager'))
         self.setWindowIcon(QIcon('images.png'))
@@ -509,6 +2628,7 @@ class TaskManager(QMainWindow):
         self.calendar.setLocale(QLocale(QLocale.Language.Persian) if self.language == 'fa' else QLocale())
         self.calendar.setGridVisible(True)
         self.calendar.clicked.connect(self.update_task_list)
+        self.calendar.currentPageChanged.connect(self.update_day_badges)
         self.tasks_layout.addWidget(self.calendar)
 
         self.search_bar = QLineEdit()
@@ -516,14 +2636,64 @@ class TaskManager(QMainWindow):
         self.search_bar.textChanged.connect(self.search_tasks)
         self.tasks_layout.addWidget(self.search_bar)
 
+        filter_layout = QHBoxLayout()
+        self.priority_filter_combo = QComboBox()
+        self.priority_filter_combo.addItem(self.tr('All'), None)
+        for code, name in PRIORITIES.items():
+            self.priority_filter_combo.addItem(self.tr(name), code)
+        filter_layout.addWidget(QLabel(self.tr('Priority')))
+        filter_layout.addWidget(self.priority_filter_combo)
+        self.status_filter_combo = QComboBox()
+        self.status_filter_combo.addItem(self.tr('All'), None)
+        for code, name in STATUSES.items():
+            self.status_filter_combo.addItem(self.tr(name), code)
+        filter_layout.addWidget(QLabel(self.tr('Status')))
+        filter_layout.addWidget(self.status_filter_combo)
+        self.category_filter_combo = QComboBox()
+        filter_layout.addWidget(QLabel(self.tr('Category')))
+        filter_layout.addWidget(self.category_filter_combo)
+        self.sort_combo = QComboBox()
+        self.sort_combo.addItem(self.tr('Sort by time'), 'time')
+        self.sort_combo.addItem(self.tr('Sort by priority'), 'priority')
+        filter_layout.addWidget(self.sort_combo)
+        for combo in (self.priority_filter_combo, self.status_filter_combo, self.category_filter_combo, self.sort_combo):
+            combo.currentIndexChanged.connect(self.refresh_task_view)
+        self.tasks_layout.addLayout(filter_layout)
+
         self.task_list = QListWidget()
         self.task_list.setAlternatingRowColors(True)
         self.task_list.setMinimumHeight(200)
+        self.task_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.task_list.itemSelectionChanged.connect(self.update_bulk_actions)
         scroll = QScrollArea()
         scroll.setWidget(self.task_list)
         scroll.setWidgetResizable(True)
         self.tasks_layout.addWidget(scroll)
 
+        bulk_layout = QHBoxLayout()
+        self.bulk_complete_btn = QPushButton(self.tr('Complete Selected'))
+        self.bulk_complete_btn.clicked.connect(lambda: self.bulk_update_status('completed'))
+        bulk_layout.addWidget(self.bulk_complete_btn)
+        self.bulk_reopen_btn = QPushButton(self.tr('Reopen Selected'))
+        self.bulk_reopen_btn.clicked.connect(lambda: self.bulk_update_status('pending'))
+        bulk_layout.addWidget(self.bulk_reopen_btn)
+        self.bulk_delete_btn = QPushButton(self.tr('Delete Selected'))
+        self.bulk_delete_btn.clicked.connect(self.bulk_delete)
+        bulk_layout.addWidget(self.bulk_delete_btn)
+        self.bulk_date_edit = QDateEdit()
+        self.bulk_date_edit.setCalendarPopup(True)
+        self.bulk_date_edit.setDate(QDate.currentDate())
+        bulk_layout.addWidget(self.bulk_date_edit)
+        self.bulk_reschedule_btn = QPushButton(self.tr('Reschedule'))
+        self.bulk_reschedule_btn.clicked.connect(self.bulk_reschedule)
+        bulk_layout.addWidget(self.bulk_reschedule_btn)
+        self.bulk_category_combo = QComboBox()
+        bulk_layout.addWidget(self.bulk_category_combo)
+        self.bulk_category_btn = QPushButton(self.tr('Set Category'))
+        self.bulk_category_btn.clicked.connect(self.bulk_set_category)
+        bulk_layout.addWidget(self.bulk_category_btn)
+        self.tasks_layout.addLayout(bulk_layout)
+
         self.progress_bar = QProgressBar()
         self.progress_bar.setTextVisible(True)
         self.progress_bar.setFormat(self.tr('%p% Completed'))
@@ -542,9 +2712,48 @@ class TaskManager(QMainWindow):
 
         self.tasks_layout.addLayout(btn_layout)
 
+        # Agenda Tab
+        self.agenda_tab = QWidget()
+        self.agenda_layout = QVBoxLayout(self.agenda_tab)
+        self.agenda_range_combo = QComboBox()
+        self.agenda_range_combo.addItem(self.tr('Next 7 days'), 7)
+        self.agenda_range_combo.addItem(self.tr('Next 30 days'), 30)
+        self.agenda_range_combo.addItem(self.tr('Next 90 days'), 90)
+        self.agenda_range_combo.addItem(self.tr('Overdue'), 0)
+        self.agenda_range_combo.currentIndexChanged.connect(self.reset_agenda)
+        self.agenda_layout.addWidget(self.agenda_range_combo)
+
+        self.agenda_list = QListWidget()
+        self.agenda_list.setAlternatingRowColors(True)
+        self.agenda_list.itemDoubleClicked.connect(self.open_agenda_task)
+        self.agenda_list.verticalScrollBar().valueChanged.connect(self.load_agenda_on_scroll)
+        scroll = QScrollArea()
+        scroll.setWidget(self.agenda_list)
+        scroll.setWidgetResizable(True)
+        self.agenda_layout.addWidget(scroll)
+
         # History Tab
         self.history_tab = QWidget()
         self.history_layout = QVBoxLayout(self.history_tab)
+        year_layout = QHBoxLayout()
+        self.prev_year_btn = QToolButton()
+        self.prev_year_btn.setArrowType(Qt.ArrowType.LeftArrow)
+        self.prev_year_btn.clicked.connect(lambda: self.change_heatmap_year(-1))
+        year_layout.addWidget(self.prev_year_btn)
+        self.heatmap_year_label = QLabel()
+        year_layout.addWidget(self.heatmap_year_label)
+        self.next_year_btn = QToolButton()
+        self.next_year_btn.setArrowType(Qt.ArrowType.RightArrow)
+        self.next_year_btn.clicked.connect(lambda: self.change_heatmap_year(1))
+        year_layout.addWidget(self.next_year_btn)
+        year_layout.addStretch()
+        self.history_layout.addLayout(year_layout)
+        self.heatmap = CompletionHeatmap(self.db)
+        self.heatmap.setLayoutDirection(Qt.LayoutDirection.LeftToRight)
+        self.heatmap.dateClicked.connect(self.show_heatmap_date)
+        self.history_layout.addWidget(self.heatmap)
+        self.change_heatmap_year(0)
+
         self.history_calendar = QCalendarWidget()
         self.history_calendar.setLocale(QLocale(QLocale.Language.Persian) if self.language == 'fa' else QLocale())
         self.history_calendar.clicked.connect(self.show_history_details)
@@ -589,10 +2798,82 @@ class TaskManager(QMainWindow):
         self.restore_btn.clicked.connect(self.restore_database)
         self.settings_layout.addWidget(self.restore_btn, 3, 1)
 
+        self.export_btn = QPushButton(self.tr('Export Data'))
+        self.export_btn.clicked.connect(lambda: ExportDialog(self).exec())
+        self.settings_layout.addWidget(self.export_btn, 6, 0)
+
+        self.import_btn = QPushButton(self.tr('Import Data'))
+        self.import_btn.clicked.connect(self.import_data)
+        self.settings_layout.addWidget(self.import_btn, 6, 1)
+
+        self.sync_btn = QPushButton(self.tr('Sync'))
+        self.sync_btn.clicked.connect(self.sync_database)
+        self.settings_layout.addWidget(self.sync_btn, 9, 0)
+        self.sync_label = QLabel()
+        self.settings_layout.addWidget(self.sync_label, 9, 1)
+
+        self.calendar_combo = QComboBox()
+        self.calendar_combo.addItem(self.tr('Gregorian'), 'gregorian')
+        self.calendar_combo.addItem(self.tr('Jalali'), 'jalali')
+        self.calendar_combo.setCurrentIndex(self.calendar_combo.findData(self.calendar_system))
+        self.calendar_combo.currentIndexChanged.connect(self.change_calendar_system)
+        self.settings_layout.addWidget(QLabel(self.tr('Calendar')), 10, 0)
+        self.settings_layout.addWidget(self.calendar_combo, 10, 1)
+
+        self.archive_horizon_spin = QSpinBox()
+        self.archive_horizon_spin.setRange(7, 3650)
+        self.archive_horizon_spin.setValue(int(self.db.get_setting('archive_horizon_days', '90')))
+        self.archive_horizon_spin.valueChanged.connect(lambda value: self.db.save_setting('archive_horizon_days', str(value)))
+        self.settings_layout.addWidget(QLabel(self.tr('Archive tasks older than (days)')), 4, 0)
+        self.settings_layout.addWidget(self.archive_horizon_spin, 4, 1)
+
+        self.maintenance_btn = QPushButton(self.tr('Run Maintenance'))
+        self.maintenance_btn.clicked.connect(self.run_maintenance)
+        self.settings_layout.addWidget(self.maintenance_btn, 5, 0)
+        self.maintenance_label = QLabel()
+        self.settings_layout.addWidget(self.maintenance_label, 5, 1)
+        self.compact_btn = QPushButton(self.tr('Compact Database'))
+        self.compact_btn.setToolTip(self.tr('One-time conversion so idle maintenance can reclaim free space'))
+        self.compact_btn.clicked.connect(self.compact_database)
+        self.compact_btn.setVisible(bool(self.db.schemas_needing_compaction()))
+        self.settings_layout.addWidget(self.compact_btn, 11, 0)
+
+        self.rollover_combo = QComboBox()
+        self.rollover_combo.addItem(self.tr('Off'), 'off')
+        self.rollover_combo.addItem(self.tr('Move to today'), 'move')
+        self.rollover_combo.addItem(self.tr('Copy to today'), 'clone')
+        self.rollover_combo.setCurrentIndex(ROLLOVER_POLICIES.index(self.db.get_setting('rollover_policy', 'off')))
+        self.rollover_combo.currentIndexChanged.connect(self.change_rollover_policy)
+        self.settings_layout.addWidget(QLabel(self.tr('Unfinished tasks from previous days')), 7, 0)
+        self.settings_layout.addWidget(self.rollover_combo, 7, 1)
+
+        rule_layout = QHBoxLayout()
+        self.rollover_category_combo = QComboBox()
+        rule_layout.addWidget(self.rollover_category_combo)
+        self.rollover_rule_combo = QComboBox()
+        self.rollover_rule_combo.addItem(self.tr('Default'), None)
+        self.rollover_rule_combo.addItem(self.tr('Off'), 'off')
+        self.rollover_rule_combo.addItem(self.tr('Move to today'), 'move')
+        self.rollover_rule_combo.addItem(self.tr('Copy to today'), 'clone')
+        rule_layout.addWidget(self.rollover_rule_combo)
+        self.category_color_btn = QPushButton(self.tr('Color'))
+        self.category_color_btn.clicked.connect(self.change_category_color)
+        rule_layout.addWidget(self.category_color_btn)
+        self.rollover_category_combo.currentIndexChanged.connect(self.show_rollover_rule)
+        self.rollover_rule_combo.currentIndexChanged.connect(self.change_rollover_rule)
+        self.update_category_combos()
+        self.settings_layout.addWidget(QLabel(self.tr('Rule for category')), 8, 0)
+        self.settings_layout.addLayout(rule_layout, 8, 1)
+        self.show_maintenance_report()
+
         self.tabs.addTab(self.tasks_tab, self.tr('Tasks'))
+        self.tabs.addTab(self.agenda_tab, self.tr('Agenda'))
         self.tabs.addTab(self.history_tab, self.tr('History'))
         self.tabs.addTab(self.settings_tab, self.tr('Settings'))
 
+        self.tabs.currentChanged.connect(lambda index: self.reset_agenda() if self.tabs.widget(index) is self.agenda_tab else None)
+
+        self.apply_calendar_system()
         self.update_task_list()
         self.set_theme()
         self.set_layout_direction()
@@ -602,6 +2883,7 @@ class TaskManager(QMainWindow):
         self.central_widget.setLayoutDirection(direction)
         self.task_list.setLayoutDirection(direction)
         self.history_details.setLayoutDirection(direction)
+        self.agenda_list.setLayoutDirection(direction)
         self.tabs.setLayoutDirection(direction)
         self.search_bar.setLayoutDirection(direction)
         self.calendar.setLayoutDirection(direction)
@@ -614,7 +2896,14 @@ class TaskManager(QMainWindow):
         self.reminder_timer.start(60000)
         self.daily_check_timer = QTimer()
         self.daily_check_timer.timeout.connect(self.check_daily_plan)
+        self.daily_check_timer.timeout.connect(self.check_rollover)
         self.daily_check_timer.start(3600000)
+        self.schedule_rollover()
+        self.maintenance_job = 0
+        self.maintenance_totals = None
+        self.maintenance_timer = QTimer()
+        self.maintenance_timer.timeout.connect(self.run_idle_maintenance)
+        self.maintenance_timer.start(30000)
 
     def setup_system_tray(self):
         self.system_tray = QSystemTrayIcon(QIcon('images.png'), self)
@@ -626,37 +2915,225 @@ class TaskManager(QMainWindow):
         self.system_tray.setContextMenu(menu)
         self.system_tray.show()
 
-    def update_task_list(self):
-        date = self.calendar.selectedDate().toString('yyyy-MM-dd')
+    # Only called while holding the instance lock, so an address left behind belongs to a crashed instance
+    def setup_instance_server(self):
+        self.instance_server = QLocalServer(self)
+        if not self.instance_server.listen(instance_address()):
+            QLocalServer.removeServer(instance_address())
+            self.instance_server.listen(instance_address())
+        self.instance_server.newConnection.connect(self.accept_instance_connection)
+
+    def accept_instance_connection(self):
+        connection = self.instance_server.nextPendingConnection()
+        connection.readyRead.connect(lambda: self.read_instance_commands(connection))
+        connection.disconnected.connect(connection.deleteLater)
+
+    def read_instance_commands(self, connection):
+        while connection.canReadLine():
+            try:
+                result = self.handle_instance_command(json.loads(bytes(connection.readLine()).decode('utf-8')))
+            except (ValueError, KeyError, TypeError) as e:
+                result = {'ok': False, 'error': str(e)}
+            connection.write((json.dumps(result) + '\n').encode('utf-8'))
+            connection.flush()
+
+    def handle_instance_command(self, command):
+        result = {'ok': True}
+        if command['command'] == 'show':
+            self.showNormal()
+            self.raise_()
+            self.activateWindow()
+        elif command['command'] == 'add':
+            result['id'] = self.db.add_task(command['title'], '', command['date'], command['time'], DEFAULT_PRIORITY, '', False, None, '', '')
+            self.update_task_list()
+        elif command['command'] == 'complete':
+            self.db.update_task_status(command['id'], 'completed')
+            self.update_task_list()
+        elif command['command'] == 'sync':
+            try:
+                result['pulled'], result['pushed'] = self.db.sync_with(command['path'])
+            except (OSError, ValueError, sqlite3.Error) as e:
+                result = {'ok': False, 'error': str(e)}
+            self.heatmap.clear_cache()
+            self.categories.reload()
+            self.update_task_list()
+        else:
+            result = {'ok': False, 'error': f"unknown command: {command['command']}"}
+        return result
+
+    def populate_task_list(self, tasks):
+        self.task_list.setUpdatesEnabled(False)
         self.task_list.clear()
-        tasks = self.db.get_tasks(date)
         for task in tasks:
             item_widget = TaskItemWidget(task, self)
             item = QListWidgetItem(self.task_list)
+            item.setData(Qt.ItemDataRole.UserRole, task.id)
             item.setSizeHint(item_widget.sizeHint())
             self.task_list.addItem(item)
             self.task_list.setItemWidget(item, item_widget)
-        total_tasks = len(tasks)
-        completed_tasks = sum(1 for task in tasks if task[9] == 'completed')
+        self.task_list.setUpdatesEnabled(True)
+        self.update_bulk_actions()
+
+    def update_task_list(self):
+        date = self.calendar.selectedDate().toString('yyyy-MM-dd')
+        self.populate_task_list(self.db.get_tasks(date, **self.task_view_filters()))
+        self.db.update_history(date)
+        rows = self.db.get_daily_completion(date, date)
+        total_tasks, completed_tasks = (rows[0][1], rows[0][2] or 0) if rows else (0, 0)
         percentage = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
         self.progress_bar.setValue(int(percentage))
-        self.db.update_history(date)
+        self.heatmap.invalidate_dates([date])
+        self.update_day_badges()
 
     def search_tasks(self):
         query = self.search_bar.text().strip()
-        self.task_list.clear()
-        tasks = self.db.search_tasks(query) if query else self.db.get_tasks(self.calendar.selectedDate().toString('yyyy-MM-dd'))
+        filters = self.task_view_filters()
+        if query:
+            tasks = self.db.search_tasks(query, **filters)
+        else:
+            tasks = self.db.get_tasks(self.calendar.selectedDate().toString('yyyy-MM-dd'), **filters)
+        self.populate_task_list(tasks)
+
+    def task_view_filters(self):
+        return {
+            'priority': self.priority_filter_combo.currentData(),
+            'status': self.status_filter_combo.currentData(),
+            'category': self.category_filter_combo.currentData(),
+            'order': self.sort_combo.currentData()
+        }
+
+    def refresh_task_view(self):
+        if self.search_bar.text().strip():
+            self.search_tasks()
+        else:
+            self.update_task_list()
+
+    def selected_task_ids(self):
+        return [item.data(Qt.ItemDataRole.UserRole) for item in self.task_list.selectedItems()]
+
+    def update_bulk_actions(self):
+        enabled = bool(self.task_list.selectedItems())
+        for widget in (self.bulk_complete_btn, self.bulk_reopen_btn, self.bulk_delete_btn,
+                       self.bulk_reschedule_btn, self.bulk_category_btn):
+            widget.setEnabled(enabled)
+
+    def bulk_update_status(self, status):
+        self.heatmap.invalidate_dates(self.db.bulk_update_status(self.selected_task_ids(), status))
+        self.refresh_task_view()
+
+    def bulk_delete(self):
+        task_ids = self.selected_task_ids()
+        reply = QMessageBox.question(self, self.tr('Delete Selected'), f"{self.tr('Delete selected tasks?')} ({len(task_ids)})")
+        if reply == QMessageBox.StandardButton.Yes:
+            self.heatmap.invalidate_dates(self.db.bulk_delete(task_ids))
+            self.refresh_task_view()
+
+    def bulk_reschedule(self):
+        self.heatmap.invalidate_dates(self.db.bulk_reschedule(self.selected_task_ids(), self.bulk_date_edit.date().toString('yyyy-MM-dd')))
+        self.refresh_task_view()
+
+    def bulk_set_category(self):
+        self.db.bulk_set_category(self.selected_task_ids(), self.bulk_category_combo.currentData())
+        self.refresh_task_view()
+
+    def format_long_date(self, date):
+        if self.calendar_system == 'jalali':
+            date = Date.fromisoformat(date)
+            return f'{QLocale().dayName(date.isoweekday())} {self.jalali.format(date)}'
+        return QLocale().toString(QDate.fromString(date, 'yyyy-MM-dd'), QLocale.FormatType.LongFormat)
+
+    def reset_agenda(self):
+        self.agenda_list.clear()
+        self.agenda_after = None
+        self.agenda_last_date = None
+        self.agenda_exhausted = False
+        self.load_agenda_page()
+
+    def load_agenda_page(self, page_size=50):
+        if self.agenda_exhausted:
+            return
+        days = self.agenda_range_combo.currentData()
+        today = QDate.currentDate()
+        if days:
+            tasks = self.db.get_agenda_page(today.toString('yyyy-MM-dd'), today.addDays(days).toString('yyyy-MM-dd'),
+                                            after=self.agenda_after, limit=page_size)
+        else:
+            tasks = self.db.get_agenda_page(end=today.addDays(-1).toString('yyyy-MM-dd'), status='pending',
+                                            after=self.agenda_after, limit=page_size)
+        self.agenda_exhausted = len(tasks) < page_size
         for task in tasks:
-            item_widget = TaskItemWidget(task, self)
-            item = QListWidgetItem(self.task_list)
-            item.setSizeHint(item_widget.sizeHint())
-            self.task_list.addItem(item)
-            self.task_list.setItemWidget(item, item_widget)
+            if task.date != self.agenda_last_date:
+                header = QListWidgetItem(self.format_long_date(task.date))
+                header.setFlags(Qt.ItemFlag.NoItemFlags)
+                font = header.font()
+                font.setBold(True)
+                header.setFont(font)
+                self.agenda_list.addItem(header)
+                self.agenda_last_date = task.date
+            item = QListWidgetItem(f"{task.time or '-'}  {task.title} - {self.tr(PRIORITIES.get(task.priority, ''))}")
+            item.setData(Qt.ItemDataRole.UserRole, task.id)
+            if self.categories.color(task.category):
+                item.setIcon(self.categories.icon(task.category))
+            item.setBackground(QColor(0, 255, 0, 50) if task.status == 'completed' else QColor(255, 255, 255, 50))
+            self.agenda_list.addItem(item)
+        if tasks:
+            self.agenda_after = (tasks[-1].date, tasks[-1].time, tasks[-1].id)
+        if not self.agenda_exhausted and self.agenda_list.verticalScrollBar().maximum() == 0:
+            QTimer.singleShot(0, self.load_agenda_page)
+
+    def load_agenda_on_scroll(self, value):
+        if value >= self.agenda_list.verticalScrollBar().maximum() - 5:
+            self.load_agenda_page()
+
+    def open_agenda_task(self, item):
+        task_id = item.data(Qt.ItemDataRole.UserRole)
+        if task_id is not None:
+            TaskDialog(self, Task(task_id)).exec()
+            self.reset_agenda()
 
     def show_add_task_dialog(self):
         dialog = TaskDialog(self)
         dialog.exec()
 
+    def change_heatmap_year(self, step):
+        self.heatmap.set_year(self.heatmap.year + step)
+        self.heatmap_year_label.setText(QLocale().toString(self.heatmap.year_bounds(self.heatmap.year)[0], 'yyyy', self.heatmap.calendar_system))
+
+    def apply_calendar_system(self):
+        jalali = self.calendar_system == 'jalali'
+        self.qcalendar = QCalendar(QCalendar.System.Jalali) if jalali else QCalendar()
+        self.jalali.month_names = tuple(QCalendar(QCalendar.System.Jalali).monthName(QLocale(), month) for month in range(1, 13))
+        for widget in (self.calendar, self.history_calendar, self.bulk_date_edit):
+            widget.setCalendar(self.qcalendar)
+        self.heatmap.set_calendar(self.jalali if jalali else None, self.qcalendar)
+        self.change_heatmap_year(0)
+
+    def change_calendar_system(self):
+        self.calendar_system = self.calendar_combo.currentData()
+        self.db.save_setting('calendar_system', self.calendar_system)
+        self.apply_calendar_system()
+        self.update_day_badges()
+
+    def update_day_badges(self, year=None, month=None):
+        year, month = year or self.calendar.yearShown(), month or self.calendar.monthShown()
+        if self.calendar_system == 'jalali':
+            start, end = self.jalali.month_range(year, month)
+        else:
+            start = Date(year, month, 1)
+            end = Date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+        self.calendar.setDateTextFormat(QDate(), QTextCharFormat())
+        for date, total, completed in self.db.get_daily_completion(start.isoformat(), end.isoformat()):
+            badge = QTextCharFormat()
+            badge.setFontWeight(QFont.Weight.Bold)
+            badge.setToolTip(f'{completed or 0} / {total}')
+            if completed == total:
+                badge.setForeground(QColor('#4CAF50'))
+            self.calendar.setDateTextFormat(QDate.fromString(date, 'yyyy-MM-dd'), badge)
+
+    def show_heatmap_date(self, date):
+        self.history_calendar.setSelectedDate(date)
+        self.show_history_details()
+
     def show_history_details(self):
         date = self.history_calendar.selectedDate().toString('yyyy-MM-dd')
         self.history_details.clear()
@@ -673,13 +3150,10 @@ class TaskManager(QMainWindow):
             self.history_calendar.setPalette(palette)
             self.history_details.addItem(self.tr(f'Completion: {percentage:.1f}% ({history[3]} of {history[2]} tasks)'))
             task_ids = history[1].split(',')
-            for task_id in task_ids:
-                cursor.execute('SELECT title, status, time, priority FROM tasks WHERE id = ?', (task_id,))
-                task = cursor.fetchone()
-                if task:
-                    item = QListWidgetItem(f"{task[0]} ({task[2] or '-'}) - {task[3]} - {task[1]}")
-                    item.setBackground(QColor(0, 255, 0, 50) if task[1] == 'completed' else QColor(255, 255, 255, 50))
-                    self.history_details.addItem(item)
+            for task in self.db.get_tasks_by_ids(task_ids, ('id', 'title', 'status', 'time', 'priority')):
+                item = QListWidgetItem(f"{task.title} ({task.time or '-'}) - {self.tr(PRIORITIES.get(task.priority, ''))} - {self.tr(STATUSES.get(task.status, ''))}")
+                item.setBackground(QColor(0, 255, 0, 50) if task.status == 'completed' else QColor(255, 255, 255, 50))
+                self.history_details.addItem(item)
         else:
             self.history_details.addItem(self.tr('No tasks for this date'))
 
@@ -689,28 +3163,26 @@ class TaskManager(QMainWindow):
         now = datetime.now()
         current_date = now.strftime('%Y-%m-%d')
         current_time = now.strftime('%H:%M')
-        tasks = self.db.get_tasks(current_date)
-        for task in tasks:
-            if task[4] and task[9] == 'pending' and task[4] <= current_time:
-                notification.notify(
-                    title=self.tr('Task Reminder'),
-                    message=f"{self.tr('Task')}: {task[1]} {self.tr('is overdue!')}",
-                    app_name='Task Manager',
-                    app_icon='icon.ico',
-                    timeout=10
-                )
-                anim = QPropertyAnimation(self, b"windowOpacity")
-                anim.setDuration(500)
-                anim.setStartValue(1.0)
-                anim.setEndValue(0.7)
-                anim.setEasingCurve(QEasingCurve.Type.InOutQuad)
-                anim.start()
+        for task in self.db.get_due_tasks(current_date, current_time):
+            notification.notify(
+                title=self.tr('Task Reminder'),
+                message=f"{self.tr('Task')}: {task.title} {self.tr('is overdue!')}",
+                app_name='Task Manager',
+                app_icon='icon.ico',
+                timeout=10
+            )
+            anim = QPropertyAnimation(self, b"windowOpacity")
+            anim.setDuration(500)
+            anim.setStartValue(1.0)
+            anim.setEndValue(0.7)
+            anim.setEasingCurve(QEasingCurve.Type.InOutQuad)
+            anim.start()
 
     def check_daily_plan(self):
         if self.db.get_setting('notifications', 'true') != 'true':
             return
         tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
-        if not self.db.get_tasks(tomorrow):
+        if not self.db.get_tasks(tomorrow, ('id',)):
             notification.notify(
                 title=self.tr('Plan Tomorrow'),
                 message=self.tr('You haven’t planned tasks for tomorrow!'),
@@ -719,6 +3191,119 @@ class TaskManager(QMainWindow):
                 timeout=10
             )
 
+    def run_idle_maintenance(self):
+        if self.db.get_setting('maintenance_last_run') == datetime.now().strftime('%Y-%m-%d'):
+            return
+        if win32api.GetTickCount() - win32api.GetLastInputInfo() < 120000:
+            return
+        self.run_maintenance_step()
+
+    def run_maintenance_step(self):
+        if self.maintenance_totals is None:
+            self.maintenance_totals = {'archived': 0, 'reclaimed_bytes': 0, 'elapsed_ms': 0}
+        job = MAINTENANCE_JOBS[self.maintenance_job]
+        report = self.db.run_maintenance_step(job, int(self.db.get_setting('archive_horizon_days', '90')))
+        if job == 'archive':
+            self.maintenance_totals['archived'] += report['rows']
+        self.maintenance_totals['reclaimed_bytes'] += report['reclaimed_bytes']
+        self.maintenance_totals['elapsed_ms'] += report['elapsed_ms']
+        if not report['done']:
+            return False
+        self.maintenance_job += 1
+        if self.maintenance_job < len(MAINTENANCE_JOBS):
+            return False
+        self.maintenance_job = 0
+        self.db.save_setting('maintenance_last_run', datetime.now().strftime('%Y-%m-%d'))
+        self.db.save_setting('maintenance_report', json.dumps(self.maintenance_totals))
+        self.maintenance_totals = None
+        self.show_maintenance_report()
+        return True
+
+    def run_maintenance(self):
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            while not self.run_maintenance_step():
+                QApplication.processEvents()
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.update_task_list()
+
+    def compact_database(self):
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            self.db.compact_database()
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, self.tr('Error'), str(e))
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.compact_btn.setVisible(bool(self.db.schemas_needing_compaction()))
+
+    def show_maintenance_report(self):
+        report = self.db.get_setting('maintenance_report')
+        if not report:
+            self.maintenance_label.setText(self.tr('Never'))
+            return
+        report = json.loads(report)
+        self.maintenance_label.setText(
+            f"{self.db.get_setting('maintenance_last_run')}: {report['archived']} {self.tr('tasks archived')}, "
+            f"{report['reclaimed_bytes'] / 1024:.0f} KB {self.tr('reclaimed')}, {report['elapsed_ms']:.0f} ms"
+        )
+
+    def rollover_rules(self):
+        return json.loads(self.db.get_setting('rollover_rules', '{}'))
+
+    def change_rollover_policy(self):
+        self.db.save_setting('rollover_policy', self.rollover_combo.currentData())
+        self.check_rollover()
+
+    def show_rollover_rule(self):
+        rule = self.rollover_rules().get(self.rollover_category_combo.currentData())
+        self.rollover_rule_combo.blockSignals(True)
+        self.rollover_rule_combo.setCurrentIndex(self.rollover_rule_combo.findData(rule) if rule else 0)
+        self.rollover_rule_combo.blockSignals(False)
+
+    def change_rollover_rule(self):
+        rules = self.rollover_rules()
+        category = self.rollover_category_combo.currentData()
+        if self.rollover_rule_combo.currentData():
+            rules[category] = self.rollover_rule_combo.currentData()
+        else:
+            rules.pop(category, None)
+        self.db.save_setting('rollover_rules', json.dumps(rules))
+
+    def update_category_combos(self):
+        self.categories.populate(self.category_filter_combo, (self.tr('All'), None))
+        self.categories.populate(self.bulk_category_combo, ('', ''))
+        self.categories.populate(self.rollover_category_combo)
+        self.show_rollover_rule()
+
+    def change_category_color(self):
+        key = self.rollover_category_combo.currentData()
+        if not key:
+            return
+        color = QColorDialog.getColor(QColor(self.categories.color(key)), self)
+        if color.isValid():
+            self.categories.set_color(key, color.name())
+
+    def check_rollover(self):
+        policy = self.db.get_setting('rollover_policy', 'off')
+        rules = self.rollover_rules()
+        today = datetime.now().strftime('%Y-%m-%d')
+        if policy == 'off' and not rules or self.db.get_setting('rollover_last_run') == today:
+            return
+        moved, cloned = self.db.rollover_tasks(today, policy, rules)
+        if moved or cloned:
+            self.heatmap.clear_cache()
+            self.update_task_list()
+
+    def schedule_rollover(self):
+        QTimer.singleShot(QTime.currentTime().msecsTo(QTime(23, 59, 59, 999)) + 1000, self.run_scheduled_rollover)
+
+    def run_scheduled_rollover(self):
+        self.check_rollover()
+        self.schedule_rollover()
+
     def change_language(self, language):
         lang_map = {
             self.tr('Persian'): 'fa',
@@ -726,6 +3311,7 @@ class TaskManager(QMainWindow):
             self.tr('Chinese'): 'zh'
         }
         self.language = lang_map.get(language, 'fa')
+        self.categories.language = self.language
         self.db.save_setting('language', self.language)
         self.set_language()
         self.init_ui()
@@ -752,19 +3338,82 @@ class TaskManager(QMainWindow):
             except Exception as e:
                 QMessageBox.critical(self, self.tr('Error'), self.tr(f'Failed to backup database: {str(e)}'))
 
+    def import_data(self):
+        path, _ = QFileDialog.getOpenFileName(self, self.tr('Import Data'), '', '*.csv *.jsonl *.ics')
+        if not path:
+            return
+        progress = QProgressDialog(self.tr('Importing...'), self.tr('Cancel'), 0, 0, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def report(rows):
+            progress.setLabelText(f"{self.tr('Importing...')} {rows}")
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+
+        importer = TaskImporter(self.db, report)
+        try:
+            preview = importer.import_file(path, dry_run=True)
+            if preview is None:
+                return
+            progress.close()
+            msg = QMessageBox(self)
+            msg.setWindowTitle(self.tr('Import Data'))
+            msg.setText(
+                f"{self.tr('New tasks')}: {preview.inserted}\n"
+                f"{self.tr('Duplicates')}: {preview.duplicates}\n"
+                f"{self.tr('Errors')}: {len(preview.errors)}"
+            )
+            if preview.errors:
+                msg.setDetailedText('\n'.join(f'{line}: {error}' for line, error in preview.errors))
+            msg.setStandardButtons(QMessageBox.StandardButton.Ok | QMessageBox.StandardButton.Cancel)
+            if msg.exec() != QMessageBox.StandardButton.Ok or not preview.inserted:
+                return
+            progress.reset()
+            result = importer.import_file(path)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            QMessageBox.critical(self, self.tr('Error'), str(e))
+            return
+        finally:
+            progress.close()
+        if result is not None:
+            title = self.tr('Import cancelled') if result.cancelled else self.tr('Success')
+            QMessageBox.information(self, title, f"{self.tr('New tasks')}: {result.inserted}")
+            self.heatmap.clear_cache()
+            self.categories.reload()
+            self.update_task_list()
+
+    def sync_database(self):
+        path, _ = QInputDialog.getText(self, self.tr('Sync'), self.tr('Enter peer database or folder path:'),
+                                       text=self.db.get_setting('sync_path', ''))
+        if not path:
+            return
+        try:
+            pulled, pushed = self.db.sync_with(path)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            QMessageBox.critical(self, self.tr('Error'), str(e))
+            return
+        self.db.save_setting('sync_path', path)
+        self.sync_label.setText(f"{self.tr('Received')}: {pulled}, {self.tr('Sent')}: {pushed}")
+        self.heatmap.clear_cache()
+        self.categories.reload()
+        self.update_task_list()
+
     def restore_database(self):
         path, _ = QInputDialog.getText(self, self.tr('Restore Database'), self.tr('Enter backup file path:'))
         if path and os.path.exists(path):
             try:
                 self.db.restore_database(path)
                 QMessageBox.information(self, self.tr('Success'), self.tr('Database restored successfully!'))
+                self.heatmap.clear_cache()
+                self.categories.reload()
                 self.update_task_list()
             except Exception as e:
                 QMessageBox.critical(self, self.tr('Error'), self.tr(f'Failed to restore database: {str(e)}'))
 
     def closeEvent(self, event):
-        tasks = self.db.get_tasks(QDate.currentDate().toString('yyyy-MM-dd'))
-        pending_tasks = [task[1] for task in tasks if task[9] == 'pending']
+        tasks = self.db.get_tasks(QDate.currentDate().toString('yyyy-MM-dd'), TASK_REMINDER_COLUMNS, status='pending')
+        pending_tasks = [task.title for task in tasks]
         if pending_tasks:
             msg = QMessageBox(self)
             msg.setWindowTitle(self.tr('Pending Tasks'))
@@ -778,214 +3427,23 @@ class TaskManager(QMainWindow):
         event.accept()
 
     def tr(self, text):
-        translations = {
-            'fa': {
-                'Task Manager': 'مدیریت وظایف',
-                'Tasks': 'وظایف',
-                'History': 'تاریخچه',
-                'Settings': 'تنظیمات',
-                'Add Task': 'افزودن وظیفه',
-                'Edit Task': 'ویرایش وظیفه',
-                'Title': 'عنوان',
-                'Description': 'توضیحات',
-                'Date': 'تاریخ',
-                'Time': 'زمان',
-                'Priority': 'اولویت',
-                'Low': 'کم',
-                'Medium': 'متوسط',
-                'High': 'بالا',
-                'Category': 'دسته‌بندی',
-                'Notes': 'یادداشت‌ها',
-                'Recurring Task': 'وظیفه تکراری',
-                'Daily': 'روزانه',
-                'Weekly': 'هفتگی',
-                'Monthly': 'ماهانه',
-                'Yearly': 'سالانه',
-                'Completed': 'تکمیل شده',
-                'Delete for all future dates (if recurring)': 'حذف برای تمام تاریخ‌های آینده (در صورت تکراری بودن)',
-                'Save': 'ذخیره',
-                'Delete': 'حذف',
-                'Cancel': 'لغو',
-                'Error': 'خطا',
-                'Title is required!': 'عنوان ضروری است!',
-                'Success': 'موفقیت',
-                'Search tasks...': 'جستجوی وظایف...',
-                'Refresh': 'تازه‌سازی',
-                '%p% Completed': '%p% تکمیل شده',
-                'No tasks for this date': 'هیچ وظیفه‌ای برای این تاریخ وجود ندارد',
-                'Completion: {percentage:.1f}% ({completed} of {total} tasks)': 'تکمیل: {percentage:.1f}% ({completed} از {total} وظیفه)',
-                'Task Reminder': 'یادآور وظیفه',
-                'Task': 'وظیفه',
-                'is overdue!': 'از موعد گذشته است!',
-                'Plan Tomorrow': 'برنامه‌ریزی برای فردا',
-                'You haven’t planned tasks for tomorrow!': 'شما وظایفی برای فردا برنامه‌ریزی نکرده‌اید!',
-                'Show': 'نمایش',
-                'Quit': 'خروج',
-                'Pending Tasks': 'وظایف در انتظار',
-                'You have pending tasks:': 'شما وظایف در انتظاری دارید:',
-                'Language': 'زبان',
-                'Persian': 'فارسی',
-                'English': 'انگلیسی',
-                'Chinese': 'چینی',
-                'Theme': 'تم',
-                'System': 'سیستم',
-                'Light': 'روشن',
-                'Dark': 'تیره',
-                'Enable Notifications': 'فعال کردن اعلان‌ها',
-                'Backup Database': 'پشتیبان‌گیری از پایگاه داده',
-                'Restore Database': 'بازگرداندن پایگاه داده',
-                'Enter backup file path:': 'مسیر فایل پشتیبان را وارد کنید:',
-                'Database backed up successfully!': 'پایگاه داده با موفقیت پشتیبان‌گیری شد!',
-                'Failed to backup database: {error}': 'پشتیبان‌گیری از پایگاه داده ناموفق بود: {error}',
-                'Enter task title': 'عنوان وظیفه را وارد کنید',
-                'Enter task description': 'توضیحات وظیفه را وارد کنید',
-                'Additional notes': 'یادداشت‌های اضافی',
-                'Work': 'کار',
-                'Personal': 'شخصی',
-                'Study': 'مطالعه',
-                'Exercise': 'ورزش',
-                'Other': 'سایر'
-            },
-            'en': {
-                'Task Manager': 'Task Manager',
-                'Tasks': 'Tasks',
-                'History': 'History',
-                'Settings': 'Settings',
-                'Add Task': 'Add Task',
-                'Edit Task': 'Edit Task',
-                'Title': 'Title',
-                'Description': 'Description',
-                'Date': 'Date',
-                'Time': 'Time',
-                'Priority': 'Priority',
-                'Low': 'Low',
-                'Medium': 'Medium',
-                'High': 'High',
-                'Category': 'Category',
-                'Notes': 'Notes',
-                'Recurring Task': 'Recurring Task',
-                'Daily': 'Daily',
-                'Weekly': 'Weekly',
-                'Monthly': 'Monthly',
-                'Yearly': 'Yearly',
-                'Completed': 'Completed',
-                'Delete for all future dates (if recurring)': 'Delete for all future dates (if recurring)',
-                'Save': 'Save',
-                'Delete': 'Delete',
-                'Cancel': 'Cancel',
-                'Error': 'Error',
-                'Title is required!': 'Title is required!',
-                'Success': 'Success',
-                'Search tasks...': 'Search tasks...',
-                'Refresh': 'Refresh',
-                '%p% Completed': '%p% Completed',
-                'No tasks for this date': 'No tasks for this date',
-                'Completion: {percentage:.1f}% ({completed} of {total} tasks)': 'Completion: {percentage:.1f}% ({completed} of {total} tasks)',
-                'Task Reminder': 'Task Reminder',
-                'Task': 'Task',
-                'is overdue!': 'is overdue!',
-                'Plan Tomorrow': 'Plan Tomorrow',
-                'You haven’t planned tasks for tomorrow!': 'You haven’t planned tasks for tomorrow!',
-                'Show': 'Show',
-                'Quit': 'Quit',
-                'Pending Tasks': 'Pending Tasks',
-                'You have pending tasks:': 'You have pending tasks:',
-                'Language': 'Language',
-                'Persian': 'Persian',
-                'English': 'English',
-                'Chinese': 'Chinese',
-                'Theme': 'Theme',
-                'System': 'System',
-                'Light': 'Light',
-                'Dark': 'Dark',
-                'Enable Notifications': 'Enable Notifications',
-                'Backup Database': 'Backup Database',
-                'Restore Database': 'Restore Database',
-                'Enter backup file path:': 'Enter backup file path:',
-                'Database backed up successfully!': 'Database backed up successfully!',
-                'Failed to backup database: {error}': 'Failed to backup database: {error}',
-                'Enter task title': 'Enter task title',
-                'Enter task description': 'Enter task description',
-                'Additional notes': 'Additional notes',
-                'Work': 'Work',
-                'Personal': 'Personal',
-                'Study': 'Study',
-                'Exercise': 'Exercise',
-                'Other': 'Other'
-            },
-            'zh': {
-                'Task Manager': '任务管理器',
-                'Tasks': '任务',
-                'History': '历史记录',
-                'Settings': '设置',
-                'Add Task': '添加任务',
-                'Edit Task': '编辑任务',
-                'Title': '标题',
-                'Description': '描述',
-                'Date': '日期',
-                'Time': '时间',
-                'Priority': '优先级',
-                'Low': '低',
-                'Medium': '中',
-                'High': '高',
-                'Category': '类别',
-                'Notes': '备注',
-                'Recurring Task': '重复任务',
-                'Daily': '每天',
-                'Weekly': '每周',
-                'Monthly': '每月',
-                'Yearly': '每年',
-                'Completed': '已完成',
-                'Delete for all future dates (if recurring)': '删除所有未来日期（如果重复）',
-                'Save': '保存',
-                'Delete': '删除',
-                'Cancel': '取消',
-                'Error': '错误',
-                'Title is required!': '标题是必填项！',
-                'Success': '成功',
-                'Search tasks...': '搜索任务...',
-                'Refresh': '刷新',
-                '%p% Completed': '%p% 已完成',
-                'No tasks for this date': '此日期没有任务',
-                'Completion: {percentage:.1f}% ({completed} of {total} tasks)': '完成度：{percentage:.1f}%（{completed}/{total} 任务）',
-                'Task Reminder': '任务提醒',
-                'Task': '任务',
-                'is overdue!': '已逾期！',
-                'Plan Tomorrow': '计划明天',
-                'You haven’t planned tasks for tomorrow!': '你还没有为明天计划任务！',
-                'Show': '显示',
-                'Quit': '退出',
-                'Pending Tasks': '待完成任务',
-                'You have pending tasks:': '你有待完成的任务：',
-                'Language': '语言',
-                'Persian': '波斯语',
-                'English': '英语',
-                'Chinese': '中文',
-                'Theme': '主题',
-                'System': '系统',
-                'Light': '明亮',
-                'Dark': '暗色',
-                'Enable Notifications': '启用通知',
-                'Backup Database': '备份数据库',
-                'Restore Database': '恢复数据库',
-                'Enter backup file path:': '输入备份文件路径：',
-                'Database backed up successfully!': '数据库备份成功！',
-                'Failed to backup database: {error}': '数据库备份失败：{error}',
-                'Enter task title': '输入任务标题',
-                'Enter task description': '输入任务描述',
-                'Additional notes': '附加备注',
-                'Work': '工作',
-                'Personal': '个人',
-                'Study': '学习',
-                'Exercise': '锻炼',
-                'Other': '其他'
-            }
-        }
-        return translations[self.language].get(text, text).format(percentage='{percentage:.1f}', completed='{completed}', total='{total}')
+        return TRANSLATIONS[self.language].get(text, text).format(percentage='{percentage:.1f}', completed='{completed}', total='{total}')
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
+    instance_lock = QLockFile(os.path.join(tempfile.gettempdir(), INSTANCE_NAME + '.lock'))
+    instance_lock.setStaleLockTime(0)
+    # Another launch holds the lock while it builds its window; forward the command once it listens
+    deadline = perf_counter() + 30
+    while not instance_lock.tryLock(200):
+        CLI_REPLY = send_instance_command(CLI_COMMAND)
+        if CLI_REPLY is None and perf_counter() > deadline:
+            CLI_REPLY = {'ok': False, 'error': 'another instance is starting but does not answer'}
+        if CLI_REPLY is not None:
+            sys.exit(report_reply(CLI_REPLY))
     app.setStyle('Fusion')
     window = TaskManager()
     window.show()
+    if CLI_COMMAND['command'] != 'show':
+        report_reply(window.handle_instance_command(CLI_COMMAND))
     sys.exit(app.exec())
\ No newline at end of file